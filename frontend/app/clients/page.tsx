@@ -1,19 +1,17 @@
 "use client";
 
 import useSWR from "swr";
+import { fetchSyncedClients } from "@/lib/utils";
 import { z } from "zod";
 import { columns } from "@/components/ui/columns-clients";
 import { DataTable } from "@/components/ui/data-table-clients";
 import { clientSchema } from "../transactions/data/schema";
 import CreateClientButton from "./create-client-button";
 
-const fetcher = (url: string) =>
-  fetch(url, { credentials: "include" }).then((res) => res.json());
-
 export default function ClientPage() {
   const { data: clients, error, mutate } = useSWR(
     `${process.env.NEXT_PUBLIC_API_URL}/api/v1/clients/`,
-    fetcher
+    fetchSyncedClients
   );
 
   if (error) {
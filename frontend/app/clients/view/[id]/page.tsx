@@ -30,7 +30,7 @@ export default function ClientView() {
     const fetchData = async () => {
       try {
         const response = await fetch(
-          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/clients/${id}/`,
+          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/clients/${id}/?expand=invoice_owner`,
           { credentials: "include" }
         );
 
@@ -114,7 +114,7 @@ export default function ClientView() {
             <h3 className="text-sm font-light tracking-tight pb-4">
               Created by:{" "}
               <span className="text-xl tracking-tight font-semibold">
-                {client.invoice_owner.name}
+                {client.invoice_owner?.name}
               </span>
             </h3>
           </div>
@@ -22,7 +22,9 @@ export const invoiceOwnerSchema = z.object({
 export const clientSchema = z.object({
   id: z.number(),
   name: z.string(),
-  invoice_owner: invoiceOwnerSchema,
+  invoice_owner_id: z.number().optional(),
+  // Only present when requested with expand=invoice_owner
+  invoice_owner: invoiceOwnerSchema.optional(),
   address: z.string().nullable().optional(),
   ntn_number: z.string().nullable().optional(),
   phone: z.string().nullable().optional(),
@@ -32,6 +34,8 @@ export const clientSchema = z.object({
 
 export const transactionSchema = z.object({
   id: z.number(),
+  client_id: z.number().optional(),
+  // Requested with expand=client wherever a transaction is parsed
   client: clientSchema,
   reference_number: z.string(),
   tax_percentage: z.number().optional().nullable(),
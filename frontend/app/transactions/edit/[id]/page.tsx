@@ -6,6 +6,7 @@ import { toast } from "sonner";
 import Cookies from "js-cookie";
 import { useEffect, useState } from "react";
 import { useSWRConfig } from "swr";
+import { fetchAllPages } from "@/lib/utils";
 
 export default function EditTransactionPage() {
   const router = useRouter();
@@ -19,7 +20,7 @@ export default function EditTransactionPage() {
       try {
         // Fetch transaction data
         const transactionResponse = await fetch(
-          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${id}/`,
+          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${id}/?expand=client`,
           {
             credentials: "include",
           }
@@ -30,16 +31,9 @@ export default function EditTransactionPage() {
         const transactionData = await transactionResponse.json();
 
         // Fetch invoice items
-        const itemsResponse = await fetch(
-          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${id}/items/`,
-          {
-            credentials: "include",
-          }
+        const itemsData = await fetchAllPages(
+          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${id}/items/`
         );
-        if (!itemsResponse.ok) {
-          throw new Error("Failed to fetch invoice items.");
-        }
-        const itemsData = await itemsResponse.json();
 
         // Combine transaction data and items data
         const combinedData = {
@@ -1,18 +1,16 @@
 "use client";
 
 import useSWR from "swr";
+import { fetchSyncedInvoices } from "@/lib/utils";
 import { z } from "zod";
 import { transactionSchema } from "./data/schema";
 import { TransactionsTable } from "@/components/transactions-table";
 import CreateTransactionButton from "./create-transaction-button";
 
-const fetcher = (url: string) =>
-  fetch(url, { credentials: "include" }).then((res) => res.json());
-
 export default function TransactionPage() {
   const { data: transactions } = useSWR(
     `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/`,
-    fetcher
+    fetchSyncedInvoices
   );
 
   if (!transactions) return;
@@ -27,6 +27,7 @@ import {
   getCountryFromIP,
   getCurrencyFromCountry,
   formatCurrency,
+  fetchAllPages,
 } from "@/lib/utils";
 import { z } from "zod";
 import downloadPdf, {
@@ -51,7 +52,7 @@ export default function TransactionViewPage() {
 
         // Fetch transaction data
         const transactionResponse = await fetch(
-          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${id}/`,
+          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${id}/?expand=client.invoice_owner`,
           { credentials: "include" }
         );
 
@@ -59,12 +60,9 @@ export default function TransactionViewPage() {
         const validatedTransaction = transactionSchema.parse(transactionData);
 
         // Fetch invoice items
-        const itemsResponse = await fetch(
-          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${id}/items/`,
-          { credentials: "include" }
+        const itemsData = await fetchAllPages(
+          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${id}/items/`
         );
-
-        const itemsData = await itemsResponse.json();
         const validatedItems = z.array(invoiceItemSchema).parse(itemsData);
 
         setTransaction(validatedTransaction);
@@ -148,7 +146,7 @@ export default function TransactionViewPage() {
               <h3 className="text-sm font-light tracking-tight pb-4">
                 Created by:{" "}
                 <span className="text-xl tracking-tight font-semibold">
-                  {transaction.client.invoice_owner.name}
+                  {transaction.client.invoice_owner?.name}
                 </span>
               </h3>
             </div>
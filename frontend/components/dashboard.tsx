@@ -20,6 +20,8 @@ import {
   getCountryFromIP,
   getCurrencyFromCountry,
   formatCurrency,
+  fetchSyncedClients,
+  fetchSyncedInvoices,
 } from "@/lib/utils";
 import { InteractiveAreaChartComponent } from "@/components/area-chart";
 import { PieChartComponent } from "@/components/pie-chart";
@@ -183,21 +185,9 @@ export default function Dashboard() {
 
   const fetchDashboardData = useCallback(async () => {
     try {
-      const [invoicesRes, clientsRes] = await Promise.all([
-        fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/`, {
-          credentials: "include",
-        }),
-        fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/v1/clients/`, {
-          credentials: "include",
-        }),
-      ]);
-
-      if (!invoicesRes.ok || !clientsRes.ok)
-        throw new Error("Failed to fetch data");
-
       const [invoicesData, clientsData] = await Promise.all([
-        invoicesRes.json(),
-        clientsRes.json(),
+        fetchSyncedInvoices(),
+        fetchSyncedClients(),
       ]);
 
       const invoices = z.array(transactionSchema).parse(invoicesData);
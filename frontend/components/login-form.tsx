@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { cn } from "@/lib/utils";
+import { cn, resetSync } from "@/lib/utils";
 import { Button } from "@/components/ui/button";
 import {
   Card,
@@ -58,6 +58,7 @@ export function LoginForm({
         throw new Error(data.detail || "Login failed");
       }
 
+      resetSync();
       await refreshUser();
       router.push("/");
       // eslint-disable-next-line @typescript-eslint/no-explicit-any
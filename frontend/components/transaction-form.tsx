@@ -19,6 +19,7 @@ import {
 } from "@/components/ui/select";
 import { useEffect, useState } from "react";
 import { z } from "zod";
+import { fetchAllPages } from "@/lib/utils";
 
 // Define the schema and types
 const formSchema = transactionSchema.pick({
@@ -101,14 +102,9 @@ export function TransactionForm({
   useEffect(() => {
     const fetchClients = async () => {
       try {
-        const response = await fetch(
-          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/clients/`,
-          {
-            credentials: "include",
-          }
+        const data = await fetchAllPages<z.infer<typeof clientSchema>>(
+          `${process.env.NEXT_PUBLIC_API_URL}/api/v1/clients/`
         );
-        if (!response.ok) throw new Error("Failed to fetch clients");
-        const data = await response.json();
         setClients(data);
       } catch (error) {
         console.error("Error fetching clients:", error);
@@ -15,6 +15,7 @@ import { toast } from "sonner";
 import { useState } from "react";
 import { useRouter } from "next/navigation";
 import { mutate } from "swr";
+import { fetchAllPages, fetchBatch } from "@/lib/utils";
 import { pdf } from "@react-pdf/renderer";
 import TransactionPDF from "@/components/transaction-pdf"; // Adjust the import path as needed
 
@@ -57,17 +58,22 @@ export const handleDelete = async (id: number, reference_number: string) => {
 
 export const downloadPdf = async (invoiceId: number) => {
   try {
-    // Fetch invoice and items data
-    const invoiceUrl = `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${invoiceId}/`;
-    const itemsUrl = `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/${invoiceId}/items/`;
-
-    const [invoiceResponse, itemsResponse] = await Promise.all([
-      fetch(invoiceUrl, { credentials: "include" }).then((res) => res.json()),
-      fetch(itemsUrl, { credentials: "include" }).then((res) => res.json()),
+    // Fetch invoice and items data in one round trip
+    const itemsPath = `/api/v1/invoices/${invoiceId}/items/`;
+    const [invoiceResponse, itemsResponse] = await fetchBatch([
+      `/api/v1/invoices/${invoiceId}/?expand=client.invoice_owner`,
+      `${itemsPath}?limit=200`,
     ]);
+    if (invoiceResponse.status !== 200 || itemsResponse.status !== 200) {
+      throw new Error("Failed to fetch invoice");
+    }
 
-    const invoice = invoiceResponse;
-    const items = itemsResponse;
+    const invoice = invoiceResponse.body as any;
+    const itemsPage = itemsResponse.body as { items: unknown[]; next: string | null };
+    // Very long invoices need more than one page of items
+    const items = itemsPage.next
+      ? await fetchAllPages(`${process.env.NEXT_PUBLIC_API_URL}${itemsPath}`)
+      : itemsPage.items;
 
     // Generate PDF blob
     const blob = await pdf(
@@ -4,6 +4,7 @@ import { useState, useEffect, useCallback } from "react";
 import { TrendingUp, TrendingDown } from "lucide-react";
 
 import { Bar, BarChart, CartesianGrid, XAxis } from "recharts";
+import { fetchAllPages } from "@/lib/utils";
 
 import {
   Card,
@@ -59,13 +60,9 @@ export function Overview() {
 
   const fetchInvoices = useCallback(async () => {
     try {
-      const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/`, {
-        credentials: "include",
-      });
-
-      if (!res.ok) throw new Error("Failed to fetch invoices");
-
-      const invoices: Invoice[] = await res.json();
+      const invoices = await fetchAllPages<Invoice>(
+        `${process.env.NEXT_PUBLIC_API_URL}/api/v1/invoices/?fields=is_quotation,date,created_at`
+      );
 
       const monthYearMap = new Map<string, { invoice: number; quotation: number }>();
 
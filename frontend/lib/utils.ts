@@ -19,6 +19,186 @@ export function absoluteUrl(path: string) {
   return `${process.env.NEXT_PUBLIC_API_URL}${path}`;
 }
 
+// List endpoints return one page at a time; follow the `next` cursors to collect every item.
+export async function fetchAllPages<T = unknown>(url: string): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const pageUrl = new URL(url);
+    pageUrl.searchParams.set("limit", "200");
+    if (cursor) pageUrl.searchParams.set("cursor", cursor);
+
+    const res = await fetch(pageUrl, { credentials: "include" });
+    if (!res.ok) throw new Error(`Failed to fetch ${url}`);
+    const page: { items: T[]; next: string | null } = await res.json();
+    items.push(...page.items);
+    cursor = page.next;
+  } while (cursor);
+  return items;
+}
+
+export type BatchResponse<T = unknown> = { path: string; status: number; body: T };
+
+// Run several API reads in one round trip. Paths are relative to the API host,
+// e.g. "/api/v1/invoices/1/"; responses come back in the same order.
+export async function fetchBatch(paths: string[]): Promise<BatchResponse[]> {
+  const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/v1/batch/`, {
+    method: "POST",
+    credentials: "include",
+    headers: {
+      "Content-Type": "application/json",
+      "X-CSRFToken": Cookies.get("csrftoken") || "",
+    },
+    body: JSON.stringify({ requests: paths.map((path) => ({ path })) }),
+  });
+  if (!res.ok) throw new Error(`Failed to fetch ${paths.join(", ")}`);
+  const { responses }: { responses: BatchResponse[] } = await res.json();
+  return responses;
+}
+
+type Row = { id: number };
+
+export type SyncChanges<C extends Row, I extends Row, L extends Row> = {
+  clients: C[];
+  invoices: I[];
+  items: L[];
+  deleted: { clients: number[]; invoices: number[]; items: number[] };
+  cursor: string;
+  next: string | null;
+};
+
+// One page of everything that changed since the cursor a previous sync returned; pass
+// null for a full load. While `next` is set, ask for it with `page`; keep `cursor` once the
+// last page is in. Apply the changed rows first, then the deletions, which come with the
+// first page. A deleted client or invoice takes its invoices and items with it. Resolves
+// to null when the cursor is too old (410) and the app should reload everything.
+export async function fetchChanges<C extends Row, I extends Row, L extends Row>(
+  cursor: string | null,
+  { page, kinds }: { page?: string; kinds?: string[] } = {}
+): Promise<SyncChanges<C, I, L> | null> {
+  const url = new URL(`${process.env.NEXT_PUBLIC_API_URL}/api/v1/sync/`);
+  if (page) url.searchParams.set("page", page);
+  else if (cursor) url.searchParams.set("since", cursor);
+  if (kinds) url.searchParams.set("kinds", kinds.join(","));
+  url.searchParams.set("limit", "1000");
+
+  const res = await fetch(url, { credentials: "include" });
+  if (res.status === 410) return null;
+  if (!res.ok) throw new Error(`Failed to sync (${res.status})`);
+  return res.json();
+}
+
+type SyncedClient = Row & Record<string, unknown>;
+type SyncedInvoice = Row & { client_id: number } & Record<string, unknown>;
+
+type SyncedLists = {
+  cursor: string | null;
+  clients: Map<number, SyncedClient>;
+  invoices: Map<number, SyncedInvoice>;
+};
+
+// The client and transaction lists read from here. The rows and the cursor are kept in
+// localStorage, so a page load only transfers what changed since the last visit. The
+// lists never show items, so items are not synced.
+const SYNC_STORAGE_KEY = "sync-lists";
+const SYNC_KINDS = ["clients", "invoices"];
+
+let synced: SyncedLists | null = null;
+let lastSync: Promise<unknown> = Promise.resolve();
+
+function emptyLists(): SyncedLists {
+  return { cursor: null, clients: new Map(), invoices: new Map() };
+}
+
+function loadLists(): SyncedLists {
+  try {
+    const stored = JSON.parse(localStorage.getItem(SYNC_STORAGE_KEY) || "null");
+    if (stored) {
+      return {
+        cursor: stored.cursor,
+        clients: new Map(stored.clients.map((client: SyncedClient) => [client.id, client])),
+        invoices: new Map(stored.invoices.map((invoice: SyncedInvoice) => [invoice.id, invoice])),
+      };
+    }
+  } catch (error) {
+    console.error("Error reading synced lists:", error);
+  }
+  return emptyLists();
+}
+
+function storeLists(lists: SyncedLists) {
+  try {
+    localStorage.setItem(
+      SYNC_STORAGE_KEY,
+      JSON.stringify({
+        cursor: lists.cursor,
+        clients: Array.from(lists.clients.values()),
+        invoices: Array.from(lists.invoices.values()),
+      })
+    );
+  } catch (error) {
+    // Over the storage quota: the lists still work, they are just loaded in full next visit
+    localStorage.removeItem(SYNC_STORAGE_KEY);
+  }
+}
+
+async function applyChanges(): Promise<SyncedLists> {
+  const lists = synced ?? loadLists();
+  let since = lists.cursor;
+  let page: string | undefined;
+  do {
+    const changes = await fetchChanges<SyncedClient, SyncedInvoice, Row>(since, { page, kinds: SYNC_KINDS });
+    if (changes === null) {
+      // The cursor is too old; start again from an empty store
+      Object.assign(lists, emptyLists());
+      since = null;
+      page = undefined;
+      continue;
+    }
+    changes.clients.forEach((client) => lists.clients.set(client.id, client));
+    changes.invoices.forEach((invoice) => lists.invoices.set(invoice.id, invoice));
+    changes.deleted.clients.forEach((id) => lists.clients.delete(id));
+    changes.deleted.invoices.forEach((id) => lists.invoices.delete(id));
+    page = changes.next ?? undefined;
+    if (!page) lists.cursor = changes.cursor;
+  } while (page);
+
+  lists.invoices.forEach((invoice, id) => {
+    if (!lists.clients.has(invoice.client_id)) lists.invoices.delete(id);
+  });
+  synced = lists;
+  storeLists(lists);
+  return lists;
+}
+
+// Bring the synced lists up to date. Syncs run one after another, so each starts from
+// the cursor the previous one left and sees writes made before it was asked for.
+export function syncLists(): Promise<SyncedLists> {
+  const sync = lastSync.catch(() => undefined).then(applyChanges);
+  lastSync = sync;
+  return sync;
+}
+
+export async function fetchSyncedClients(): Promise<SyncedClient[]> {
+  const { clients } = await syncLists();
+  return Array.from(clients.values());
+}
+
+// Invoices with their client attached, as the API returns them with expand=client.
+export async function fetchSyncedInvoices(): Promise<SyncedInvoice[]> {
+  const { clients, invoices } = await syncLists();
+  return Array.from(invoices.values()).map((invoice) => ({
+    ...invoice,
+    client: clients.get(invoice.client_id),
+  }));
+}
+
+// Forget the synced lists, e.g. when the user logs in or out.
+export function resetSync() {
+  synced = null;
+  localStorage.removeItem(SYNC_STORAGE_KEY);
+}
+
 export const getCountryFromIP = async (): Promise<string> => {
   try {
     const res = await fetch("https://ipinfo.io/json?token=a7b20789cf45dd");
@@ -85,6 +265,7 @@ export const formatCurrency = (amount: number, currency: string) => {
 };
 
 export const logout = async (): Promise<Response | void> => {
+  resetSync();
   try {
     const csrfToken = Cookies.get("csrftoken");
     const res: Response = await fetch(
@@ -88,6 +88,12 @@ class InvoiceAdmin(admin.ModelAdmin):
             return
         super().save_model(request, obj, form, change)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Inline items are saved after the invoice, so refresh its totals once they are in.
+        if form.instance.pk:
+            form.instance.update_totals()
+
 
 class InvoiceItemAdmin(admin.ModelAdmin):
     list_display = ('invoice', 'name', 'description', 'quantity', 'unit_price', 'total_price')
@@ -1,22 +1,66 @@
-from ninja import File, NinjaAPI, UploadedFile
+import os
+from functools import wraps
+from asgiref.sync import sync_to_async
+from ninja import File, Query, UploadedFile
 from django.contrib.auth import authenticate, login as django_login, logout as django_logout
-from django.views.decorators.cache import cache_page
 from django_ratelimit.decorators import ratelimit
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.http import content_disposition_header, urlsafe_base64_decode, urlsafe_base64_encode
 from django.utils.encoding import force_str, force_bytes
 from django.contrib.auth.tokens import default_token_generator
 from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from django.db import connection, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
 from typing import List, Optional
 from ninja.security import django_auth
 from ninja.pagination import paginate
 from ninja.responses import Response
 from django_ratelimit.exceptions import Ratelimited
-from .models import InvoiceOwner, Client, Invoice, InvoiceItem
+from .models import InvoiceOwner, Client, Invoice, InvoiceItem, PDFJob
+from .auth import async_django_auth
+from .cache import cached_response
+from .fieldsets import (
+    client_fieldset,
+    invoice_owner_fieldset,
+    invoice_fieldset,
+    invoice_item_fieldset,
+    paginated_serializer,
+    parse_ids,
+)
+from .etags import (
+    etag_response,
+    if_match,
+    client_etag,
+    invoice_etag,
+    invoice_item_etag,
+    invoice_item_list_etag,
+    list_etag,
+    invoice_owner_etag,
+)
+from .batch import MAX_BATCH_REQUESTS, run_batch
+from .exporter import iter_invoice_lines
+from .importer import FORMATS, IMPORTERS, guess_format, import_records
+from .mail import send_user_email
+from .pagination import MAX_PAGE_SIZE, CursorPagination
+from .renderers import NegotiatingNinjaAPI, NegotiatingRenderer
+from .pdf import aiter_file, invoice_fingerprint, pdf_cache, stream_invoice_pdfs_zip
+from .search import search_results
+from .suggest import MAX_SUGGESTIONS, suggest_clients
+from .sync import (
+    MAX_SYNC_PAGE_SIZE,
+    SYNC_KINDS,
+    SYNC_PAGE_SIZE,
+    SyncPage,
+    changes_since,
+    decode_sync_cursor,
+    parse_sync_kinds,
+    stamp_on_commit,
+)
 from .schemas import (
     LoginSchema,
     InvoiceOwnerCreate,
@@ -25,73 +69,104 @@ from .schemas import (
     ClientCreate,
     ClientUpdate,
     ClientOut,
+    ClientSuggestionOut,
     InvoiceCreate,
     InvoiceUpdate,
+    InvoiceFilter,
     InvoiceOut,
     InvoiceItemCreate,
     InvoiceItemUpdate,
+    InvoiceItemBatchUpdate,
     InvoiceItemOut,
+    PDFJobOut,
+    ImportReportOut,
     ResetPasswordSchema,
     ForgotPasswordRequestSchema,
     ErrorSchema,
     SuccessSchema,
+    SyncOut,
+    SearchOut,
+    BatchIn,
+    BatchOut,
+)
+
+api = NegotiatingNinjaAPI(
+    title="Invoice Generator API", version="1.0.0", auth=django_auth, renderer=NegotiatingRenderer(),
 )
 
-api = NinjaAPI(title="Invoice Generator API", version="1.0.0", auth=django_auth)
-
-# -----------------------------------------------
-# Helper functions to serialize date fields to ISO strings
-# -----------------------------------------------
-def serialize_invoice_owner(owner):
-    return {
-        "id": owner.id,
-        "email": owner.email,
-        "name": owner.name,
-        "address": owner.address,
-        "phone": owner.phone,
-        "phone_2": owner.phone_2,
-        "ntn_number": owner.ntn_number,
-        "bank": owner.bank,
-        "account_title": owner.account_title,
-        "iban": owner.iban,
-        "logo": owner.logo.url if owner.logo else None,
-        "signature": owner.signature.url if owner.signature else None,
-        "is_onboarded": owner.is_onboarded,
-        "created_at": owner.created_at.isoformat(),
-        "updated_at": owner.updated_at.isoformat(),
-        "is_staff": owner.is_staff,
-    }
-
-def serialize_client(client):
-    return {
-        "id": client.id,
-        "invoice_owner": serialize_invoice_owner(client.invoice_owner),
-        "name": client.name,
-        "address": client.address,
-        "ntn_number": client.ntn_number,
-        "phone": client.phone,
-        "created_at": client.created_at.isoformat(),
-        "updated_at": client.updated_at.isoformat(),
-    }
-
-def serialize_invoice(invoice):
-    return {
-        "id": invoice.id,
-        "client": serialize_client(invoice.client),
-        "reference_number": invoice.reference_number,
-        "tax_percentage": invoice.tax_percentage,
-        "total_price": invoice.total_price,
-        "tax": invoice.tax,
-        "grand_total": invoice.grand_total,
-        "date": invoice.date.isoformat() if invoice.date else None,
-        "notes": invoice.notes,
-        "is_paid": invoice.is_paid,
-        "is_taxed": invoice.is_taxed,
-        "is_quotation": invoice.is_quotation,
-        "transit_charges": invoice.transit_charges,
-        "created_at": invoice.created_at.isoformat(),
-        "updated_at": invoice.updated_at.isoformat(),
-    }
+def get_values_or_404(selection, queryset):
+    """Serialize the only row of a queryset through a fieldset Selection, or raise Http404."""
+    data = selection.get(queryset)
+    if data is None:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    return data
+
+# Read endpoints are sync views under WSGI. Under ASGI (API_ASYNC_VIEWS) they are
+# served as async views whose body runs in one worker thread, so the event loop is
+# never blocked and a request makes one thread hop rather than one per query.
+read_auth = async_django_auth if settings.API_ASYNC_VIEWS else django_auth
+
+def read_view(view):
+    """
+    Goes directly above the view function, under any @paginate. Leaves the view
+    sync unless API_ASYNC_VIEWS is set, since WSGI would otherwise run every
+    operation on the view's path through async_to_sync.
+    """
+    if not settings.API_ASYNC_VIEWS:
+        return view
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(view)(request, *args, **kwargs)
+    return wrapper
+
+async def aiter_sync(chunks):
+    """
+    Yield a sync iterator's chunks for an async response, pulling each in the
+    request's sync thread. Querysets read by the iterator keep the connection
+    of the thread that opened them.
+    """
+    next_chunk = sync_to_async(next)
+    done = object()
+    try:
+        while (chunk := await next_chunk(chunks, done)) is not done:
+            yield chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close)()
+
+def streaming_response(request, chunks, content_type):
+    """
+    A StreamingHttpResponse of ``chunks``. Under ASGI Django reads a sync
+    iterator into one list before sending, so it is handed over as an async one.
+    """
+    if isinstance(request, ASGIRequest):
+        chunks = aiter_sync(chunks)
+    return StreamingHttpResponse(chunks, content_type=content_type)
+
+def filter_invoices(request, filters: InvoiceFilter):
+    """Invoices visible to the user, narrowed by an InvoiceFilter."""
+    if request.user.is_staff:
+        invoices = Invoice.objects.all()
+        if filters.owner_id is not None:
+            invoices = invoices.filter(client__invoice_owner_id=filters.owner_id)
+    else:
+        invoices = Invoice.objects.filter(client__invoice_owner=request.user)
+
+    if filters.client_id is not None:
+        invoices = invoices.filter(client_id=filters.client_id)
+    if filters.is_quotation is not None:
+        invoices = invoices.filter(is_quotation=filters.is_quotation)
+    if filters.is_paid is not None:
+        invoices = invoices.filter(is_paid=filters.is_paid)
+    if filters.date_from or filters.date_to:
+        # Same date the PDF shows: the invoice date, or the creation date when unset
+        invoices = invoices.annotate(document_date=Coalesce('date', TruncDate('created_at')))
+        if filters.date_from:
+            invoices = invoices.filter(document_date__gte=filters.date_from)
+        if filters.date_to:
+            invoices = invoices.filter(document_date__lte=filters.date_to)
+    return invoices
 
 # -------------------------
 # Authentication & Rate Limiting
@@ -149,7 +224,8 @@ def logout(request):
     response.delete_cookie("auth_ready")
     return response
 
-@api.get("auth/current-user/", response=InvoiceOwnerOut, auth=django_auth)
+@api.get("auth/current-user/", response=InvoiceOwnerOut, auth=read_auth)
+@read_view
 def current_user(request):
     return request.user
 
@@ -157,21 +233,30 @@ def current_user(request):
 # InvoiceOwner Endpoints
 # -------------------------
 
-@cache_page(60 * 5)
-@paginate
-@api.get("/invoice-owners/", response={200: List[InvoiceOwnerOut], 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@api.get("/invoice-owners/", response={200: List[InvoiceOwnerOut], 403: ErrorSchema, 500: ErrorSchema}, auth=read_auth)
+@api.trusted_response
+@etag_response(list_etag)
+@cached_response()
+@paginate(CursorPagination, serializer=paginated_serializer(invoice_owner_fieldset))
+@read_view
 def list_invoice_owners(request):
-    if request.user.is_staff:
-        return InvoiceOwner.objects.all()
-    return InvoiceOwner.objects.filter(id=request.user.id)
-
-@api.get("/invoice-owners/{id}/", response={200: InvoiceOwnerOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+    owners = InvoiceOwner.objects.all()
+    if not request.user.is_staff:
+        owners = owners.filter(id=request.user.id)
+    return invoice_owner_fieldset.select().values(owners)
+
+@api.get("/invoice-owners/{id}/", response={200: InvoiceOwnerOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=read_auth)
+@api.trusted_response
+@etag_response(invoice_owner_etag)
+@cached_response()
+@read_view
 def get_invoice_owner(request, id: int):
     if not request.user.is_staff and id != request.user.id:
         return 403, {"detail": "You do not have permission to view this user."}
-    return get_object_or_404(InvoiceOwner, id=id)
+    return get_values_or_404(invoice_owner_fieldset.select(), InvoiceOwner.objects.filter(id=id))
 
-@api.patch("/invoice-owners/{id}/", response={200: InvoiceOwnerOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 422: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@api.patch("/invoice-owners/{id}/", response={200: InvoiceOwnerOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 422: ErrorSchema, 412: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@if_match(invoice_owner_etag)
 def partial_update_invoice_owner(request, payload: InvoiceOwnerUpdate, id: int):
     if not request.user.is_staff and id != request.user.id:
         return 403, {"detail": "You do not have permission to update this user."}
@@ -242,15 +327,22 @@ def delete_invoice_owner(request, id: int):
 # Client Endpoints
 # -------------------------
 
-@cache_page(60 * 5)
-@paginate
-@api.get("/clients/", response={200: List[ClientOut], 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
-def list_clients(request):
-    if request.user.is_staff:
-        return Client.objects.all()
-    return Client.objects.filter(invoice_owner=request.user)
-
-@api.post("/clients/", response={201: ClientOut, 400: ErrorSchema, 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@api.get("/clients/", response={200: List[ClientOut], 403: ErrorSchema, 500: ErrorSchema}, auth=read_auth, exclude_unset=True)
+@api.trusted_response
+@etag_response(list_etag)
+@cached_response()
+@paginate(CursorPagination, serializer=paginated_serializer(client_fieldset))
+@read_view
+def list_clients(request, fields: Optional[str] = None, expand: Optional[str] = None, ids: Optional[str] = None):
+    selection = client_fieldset.select(fields, expand)
+    clients = Client.objects.all()
+    if not request.user.is_staff:
+        clients = clients.filter(invoice_owner=request.user)
+    if ids:
+        clients = clients.filter(id__in=parse_ids(ids))
+    return selection.values(clients, 'updated_at')
+
+@api.post("/clients/", response={201: ClientOut, 400: ErrorSchema, 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth, exclude_unset=True)
 def create_client(request, payload: ClientCreate):
     client = Client(invoice_owner=request.user, **payload.dict())
     try:
@@ -258,15 +350,28 @@ def create_client(request, payload: ClientCreate):
     except ValidationError as e:
         return 400, {"detail": e.messages}
     client.save()
-    return 201, client
-
-@api.get("/clients/{id}/", response={200: ClientOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
-def get_client(request, id: int):
-    if request.user.is_staff:
-        return get_object_or_404(Client, id=id)
-    return get_object_or_404(Client, id=id, invoice_owner=request.user)
-
-@api.patch("/clients/{id}/", response={200: ClientOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+    return 201, client_fieldset.select().from_instance(client)
+
+@api.get("/clients/suggest/", response={200: List[ClientSuggestionOut], 400: ErrorSchema, 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@api.trusted_response
+def suggest_client_names(request, q: str = '', limit: int = 10):
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return 400, {"detail": f"limit must be between 1 and {MAX_SUGGESTIONS}."}
+    return [{"id": client_id, "name": name} for client_id, name in suggest_clients(request.user, q, limit)]
+
+@api.get("/clients/{id}/", response={200: ClientOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=read_auth, exclude_unset=True)
+@api.trusted_response
+@etag_response(client_etag)
+@cached_response()
+@read_view
+def get_client(request, id: int, fields: Optional[str] = None, expand: Optional[str] = None):
+    clients = Client.objects.filter(id=id)
+    if not request.user.is_staff:
+        clients = clients.filter(invoice_owner=request.user)
+    return get_values_or_404(client_fieldset.select(fields, expand), clients)
+
+@api.patch("/clients/{id}/", response={200: ClientOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 412: ErrorSchema, 500: ErrorSchema}, auth=django_auth, exclude_unset=True)
+@if_match(client_etag)
 def partial_update_client(request, id: int, payload: ClientUpdate):
     if request.user.is_staff:
         client = get_object_or_404(Client, id=id)
@@ -280,7 +385,7 @@ def partial_update_client(request, id: int, payload: ClientUpdate):
     except ValidationError as e:
         return 400, {"detail": e.messages}
     client.save()
-    return client
+    return client_fieldset.select().from_instance(client)
 
 @api.delete("/clients/{id}/", response={204: None, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
 def delete_client(request, id: int):
@@ -295,18 +400,22 @@ def delete_client(request, id: int):
 # Invoice Endpoints
 # -------------------------
 
-@cache_page(60 * 5)
-@paginate
-@api.get("/invoices/", response={200: List[InvoiceOut], 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
-def list_invoices(request):
-    if request.user.is_staff:
-        invoices = Invoice.objects.all().order_by('-updated_at')
-    else:
-        invoices = Invoice.objects.filter(client__invoice_owner=request.user).order_by('-updated_at')
-    serialized = [serialize_invoice(inv) for inv in invoices]
-    return serialized
-
-@api.post("/invoices/", response={201: InvoiceOut, 400: ErrorSchema, 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@api.get("/invoices/", response={200: List[InvoiceOut], 403: ErrorSchema, 500: ErrorSchema}, auth=read_auth, exclude_unset=True)
+@api.trusted_response
+@etag_response(list_etag)
+@cached_response()
+@paginate(CursorPagination, serializer=paginated_serializer(invoice_fieldset))
+@read_view
+def list_invoices(request, fields: Optional[str] = None, expand: Optional[str] = None, ids: Optional[str] = None):
+    selection = invoice_fieldset.select(fields, expand)
+    invoices = Invoice.objects.all()
+    if not request.user.is_staff:
+        invoices = invoices.filter(client__invoice_owner=request.user)
+    if ids:
+        invoices = invoices.filter(id__in=parse_ids(ids))
+    return selection.values(invoices, 'updated_at')
+
+@api.post("/invoices/", response={201: InvoiceOut, 400: ErrorSchema, 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth, exclude_unset=True)
 def create_invoice(request, payload: InvoiceCreate):
     # Fetch the client object
     try:
@@ -325,17 +434,34 @@ def create_invoice(request, payload: InvoiceCreate):
         return 400, {"detail": e.messages}
 
     invoice.save()
-    return 201, serialize_invoice(invoice)
+    return 201, invoice_fieldset.select().from_instance(invoice)
 
-@api.get("/invoices/{id}/", response={200: InvoiceOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
-def get_invoice(request, id: int):
-    if request.user.is_staff:
-        invoice = get_object_or_404(Invoice, id=id)
-    else:
-        invoice = get_object_or_404(Invoice, id=id, client__invoice_owner=request.user)
-    return serialize_invoice(invoice)
+@api.get("/invoices/export.zip", response={403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+def export_invoice_pdfs(request, filters: InvoiceFilter = Query(...)):
+    invoices = filter_invoices(request, filters).select_related('client__invoice_owner').order_by('id')
+    response = streaming_response(request, stream_invoice_pdfs_zip(invoices.iterator()), 'application/zip')
+    response['Content-Disposition'] = 'attachment; filename="invoices.zip"'
+    return response
+
+@api.get("/invoices/export.ndjson", response={403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+def export_invoices_ndjson(request, filters: InvoiceFilter = Query(...)):
+    response = streaming_response(request, iter_invoice_lines(filter_invoices(request, filters)), 'application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="invoices.ndjson"'
+    return response
 
-@api.patch("/invoices/{id}/", response={200: InvoiceOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@api.get("/invoices/{id}/", response={200: InvoiceOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=read_auth, exclude_unset=True)
+@api.trusted_response
+@etag_response(invoice_etag)
+@cached_response()
+@read_view
+def get_invoice(request, id: int, fields: Optional[str] = None, expand: Optional[str] = None):
+    invoices = Invoice.objects.filter(id=id)
+    if not request.user.is_staff:
+        invoices = invoices.filter(client__invoice_owner=request.user)
+    return get_values_or_404(invoice_fieldset.select(fields, expand), invoices)
+
+@api.patch("/invoices/{id}/", response={200: InvoiceOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 412: ErrorSchema, 500: ErrorSchema}, auth=django_auth, exclude_unset=True)
+@if_match(invoice_etag)
 def update_invoice(request, id: int, payload: InvoiceUpdate):
     if request.user.is_staff:
         invoice = get_object_or_404(Invoice, id=id)
@@ -349,7 +475,7 @@ def update_invoice(request, id: int, payload: InvoiceUpdate):
     except ValidationError as e:
         return 400, {"detail": e.messages}
     invoice.save()
-    return serialize_invoice(invoice)
+    return invoice_fieldset.select().from_instance(invoice)
 
 @api.delete("/invoices/{id}/", response={204: None, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
 def delete_invoice(request, id: int):
@@ -361,20 +487,136 @@ def delete_invoice(request, id: int):
     return 204, None
 
 # -------------------------
-# InvoiceItem Endpoints
+# Sync Endpoints
+# -------------------------
+
+@api.get("/sync/", response={200: SyncOut, 400: ErrorSchema, 403: ErrorSchema, 410: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@api.trusted_response
+def sync(
+    request, since: Optional[str] = None, page: Optional[str] = None, kinds: Optional[str] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=MAX_SYNC_PAGE_SIZE),
+):
+    if page:
+        return changes_since(request.user, limit=limit, page=SyncPage.decode(page))
+    return changes_since(
+        request.user,
+        since=decode_sync_cursor(since) if since else None,
+        kinds=parse_sync_kinds(kinds) if kinds else tuple(SYNC_KINDS),
+        limit=limit,
+    )
+
 # -------------------------
+# Search Endpoints
+# -------------------------
+
+@api.get("/search/", response={200: SearchOut, 400: ErrorSchema, 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+@api.trusted_response
+@cached_response()
+def search(request, q: str, limit: int = 20, expand: Optional[str] = None):
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return 400, {"detail": f"limit must be between 1 and {MAX_PAGE_SIZE}."}
+    return search_results(request.user, q, limit, expand)
+
+# -------------------------
+# Batch Endpoints
+# -------------------------
+
+@api.post("/batch/", response={200: BatchOut, 400: ErrorSchema, 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+def batch(request, payload: BatchIn):
+    if not payload.requests or len(payload.requests) > MAX_BATCH_REQUESTS:
+        return 400, {"detail": f"Send between 1 and {MAX_BATCH_REQUESTS} requests."}
+    content = run_batch(request, [sub.path for sub in payload.requests], api.urls_namespace)
+    return HttpResponse(content, content_type='application/json; charset=utf-8')
+
+# -------------------------
+# Bulk Import Endpoints
+# -------------------------
+
+@api.post("/import/{kind}/", response={200: ImportReportOut, 400: ErrorSchema, 403: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+def import_data(request, kind: str, file: UploadedFile = File(...), format: Optional[str] = None):
+    if kind not in IMPORTERS:
+        return 400, {"detail": f"Unknown import type '{kind}'. Use one of: {', '.join(IMPORTERS)}."}
+    fmt = format or guess_format(file.name)
+    if fmt not in FORMATS:
+        return 400, {"detail": "Upload a .csv or .ndjson file, or pass format=csv|ndjson."}
+    return 200, import_records(kind, request.user, file.file, fmt)
 
-@cache_page(60 * 5)
-@paginate
-@api.get("/invoices/{invoice_id}/items/", response={200: List[InvoiceItemOut], 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
-def list_invoice_items(request, invoice_id: int):
+# -------------------------
+# PDF Job Endpoints
+# -------------------------
+
+@api.post("/invoices/{id}/pdf/", response={202: PDFJobOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+def create_pdf_job(request, id: int):
+    invoices = Invoice.objects.select_related('client__invoice_owner')
     if request.user.is_staff:
-        invoice = get_object_or_404(Invoice, id=invoice_id)
+        invoice = get_object_or_404(invoices, id=id)
     else:
-        invoice = get_object_or_404(Invoice, id=invoice_id, client__invoice_owner=request.user)
-    return InvoiceItem.objects.filter(invoice=invoice)
+        invoice = get_object_or_404(invoices, id=id, client__invoice_owner=request.user)
+
+    # Nothing to queue when the current rendering is already cached
+    fingerprint = invoice_fingerprint(invoice)
+    if pdf_cache.path_for(invoice.pk, fingerprint).exists():
+        job = PDFJob.objects.create(invoice=invoice, requested_by=request.user, status=PDFJob.DONE, fingerprint=fingerprint)
+    else:
+        job = PDFJob.objects.create(invoice=invoice, requested_by=request.user)
+    return 202, job
+
+@api.get("/pdf-jobs/{job_id}/", response={200: PDFJobOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=read_auth)
+@read_view
+def get_pdf_job(request, job_id: int):
+    if request.user.is_staff:
+        return get_object_or_404(PDFJob.objects.all(), id=job_id)
+    return get_object_or_404(PDFJob.objects.all(), id=job_id, requested_by=request.user)
+
+@api.get("/pdf-jobs/{job_id}/download/", response={403: ErrorSchema, 404: ErrorSchema, 409: ErrorSchema, 410: ErrorSchema, 500: ErrorSchema}, auth=read_auth)
+@read_view
+def download_pdf_job(request, job_id: int):
+    jobs = PDFJob.objects.select_related('invoice')
+    if request.user.is_staff:
+        job = get_object_or_404(jobs, id=job_id)
+    else:
+        job = get_object_or_404(jobs, id=job_id, requested_by=request.user)
+
+    if job.status != PDFJob.DONE:
+        return 409, {"detail": f"PDF job is {job.status}."}
+
+    pdf_file = pdf_cache.open(job.invoice_id, job.fingerprint)
+    if pdf_file is None:
+        return 410, {"detail": "The rendered PDF is no longer available. Please request a new one."}
+
+    filename = f"{job.invoice.reference_number}.pdf"
+    if not isinstance(request, ASGIRequest):
+        return FileResponse(pdf_file, as_attachment=True, filename=filename, content_type='application/pdf')
 
-@api.post("/invoices/{invoice_id}/items/", response={201: InvoiceItemOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+    # Under ASGI the file is read in worker threads chunk by chunk, so a slow download never holds the event loop or a thread
+    response = StreamingHttpResponse(aiter_file(pdf_file), content_type='application/pdf')
+    response['Content-Length'] = os.fstat(pdf_file.fileno()).st_size
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+# -------------------------
+# InvoiceItem Endpoints
+# -------------------------
+
+@api.get("/invoices/{invoice_id}/items/", response={200: List[InvoiceItemOut], 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=read_auth, exclude_unset=True)
+@api.trusted_response
+@etag_response(invoice_item_list_etag)
+@cached_response()
+@paginate(CursorPagination, ordering=('id',), serializer=paginated_serializer(invoice_item_fieldset))  # Items keep the order they were added in
+@read_view
+def list_invoice_items(request, invoice_id: int, fields: Optional[str] = None, expand: Optional[str] = None, ids: Optional[str] = None):
+    selection = invoice_item_fieldset.select(fields, expand)
+    invoices = Invoice.objects.filter(id=invoice_id)
+    if not request.user.is_staff:
+        invoices = invoices.filter(client__invoice_owner=request.user)
+    if not invoices.exists():
+        raise Http404("No Invoice matches the given query.")
+    items = InvoiceItem.objects.filter(invoice_id=invoice_id)
+    if ids:
+        items = items.filter(id__in=parse_ids(ids))
+    return selection.values(items)
+
+@api.post("/invoices/{invoice_id}/items/", response={201: InvoiceItemOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth, exclude_unset=True)
 def create_invoice_item(request, invoice_id: int, payload: InvoiceItemCreate):
     if request.user.is_staff:
         invoice = get_object_or_404(Invoice, id=invoice_id)
@@ -382,18 +624,103 @@ def create_invoice_item(request, invoice_id: int, payload: InvoiceItemCreate):
         invoice = get_object_or_404(Invoice, id=invoice_id, client__invoice_owner=request.user)
     item = InvoiceItem(invoice=invoice, **payload.dict())
     item.save()
-    invoice.save()
-    return 201, item
+    invoice.update_totals()
+    return 201, invoice_item_fieldset.select().from_instance(item)
+
+def validate_invoice_items(items):
+    """Run model validation on each item and collect the messages with their position."""
+    errors = []
+    for index, item in enumerate(items, start=1):
+        try:
+            item.full_clean(exclude=['invoice', 'total_price'])
+        except ValidationError as e:
+            errors.extend(f"Item {index}: {message}" for message in e.messages)
+        else:
+            item.total_price = item.quantity * item.unit_price
+    return errors
 
-@api.get("/invoices/{invoice_id}/items/{id}/", response={200: InvoiceItemOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
-def get_invoice_item(request, invoice_id: int, id: int):
+@api.post("/invoices/{invoice_id}/items/batch/", response={201: List[InvoiceItemOut], 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth, exclude_unset=True)
+def create_invoice_items(request, invoice_id: int, payload: List[InvoiceItemCreate]):
+    if request.user.is_staff:
+        invoice = get_object_or_404(Invoice, id=invoice_id)
+    else:
+        invoice = get_object_or_404(Invoice, id=invoice_id, client__invoice_owner=request.user)
+    items = [InvoiceItem(invoice=invoice, **data.dict()) for data in payload]
+    errors = validate_invoice_items(items)
+    if errors:
+        return 400, {"detail": errors}
+
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            InvoiceItem.objects.bulk_create(items)
+        else:
+            # MySQL does not report the new ids; read back the rows this insert added.
+            existing_ids = list(InvoiceItem.objects.filter(invoice=invoice).values_list('id', flat=True))
+            InvoiceItem.objects.bulk_create(items)
+            items = list(InvoiceItem.objects.filter(invoice=invoice).exclude(id__in=existing_ids).order_by('id'))
+        stamp_on_commit(InvoiceItem, *(item.pk for item in items))
+        invoice.update_totals()
+    selection = invoice_item_fieldset.select()
+    return 201, [selection.from_instance(item) for item in items]
+
+@api.patch("/invoices/{invoice_id}/items/batch/", response={200: List[InvoiceItemOut], 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth, exclude_unset=True)
+def update_invoice_items(request, invoice_id: int, payload: List[InvoiceItemBatchUpdate]):
     if request.user.is_staff:
         invoice = get_object_or_404(Invoice, id=invoice_id)
     else:
         invoice = get_object_or_404(Invoice, id=invoice_id, client__invoice_owner=request.user)
-    return get_object_or_404(InvoiceItem, id=id, invoice=invoice)
 
-@api.patch("/invoices/{invoice_id}/items/{id}/", response={200: InvoiceItemOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+    with transaction.atomic():
+        items = InvoiceItem.objects.select_for_update().filter(invoice=invoice).in_bulk([data.id for data in payload])
+        missing = [data.id for data in payload if data.id not in items]
+        if missing:
+            return 404, {"detail": f"Items not found on this invoice: {', '.join(map(str, missing))}"}
+
+        fields = {'total_price', 'updated_at'}
+        now = timezone.now()
+        for data in payload:
+            items[data.id].updated_at = now
+            changes = data.dict(exclude_unset=True, exclude={'id'})
+            for attr, value in changes.items():
+                setattr(items[data.id], attr, value)
+            fields.update(changes)
+
+        updated = [items[data.id] for data in payload]
+        errors = validate_invoice_items(updated)
+        if errors:
+            return 400, {"detail": errors}
+
+        InvoiceItem.objects.bulk_update(updated, fields=sorted(fields))
+        stamp_on_commit(InvoiceItem, *items)
+        invoice.update_totals()
+    selection = invoice_item_fieldset.select()
+    return 200, [selection.from_instance(item) for item in updated]
+
+@api.delete("/invoices/{invoice_id}/items/batch/", response={204: None, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
+def delete_invoice_items(request, invoice_id: int, ids: List[int] = Query(...)):
+    if request.user.is_staff:
+        invoice = get_object_or_404(Invoice, id=invoice_id)
+    else:
+        invoice = get_object_or_404(Invoice, id=invoice_id, client__invoice_owner=request.user)
+
+    with transaction.atomic():
+        InvoiceItem.objects.filter(invoice=invoice, id__in=ids).delete()
+        invoice.update_totals()
+    return 204, None
+
+@api.get("/invoices/{invoice_id}/items/{id}/", response={200: InvoiceItemOut, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=read_auth, exclude_unset=True)
+@api.trusted_response
+@etag_response(invoice_item_etag)
+@cached_response()
+@read_view
+def get_invoice_item(request, invoice_id: int, id: int, fields: Optional[str] = None, expand: Optional[str] = None):
+    items = InvoiceItem.objects.filter(id=id, invoice_id=invoice_id)
+    if not request.user.is_staff:
+        items = items.filter(invoice__client__invoice_owner=request.user)
+    return get_values_or_404(invoice_item_fieldset.select(fields, expand), items)
+
+@api.patch("/invoices/{invoice_id}/items/{id}/", response={200: InvoiceItemOut, 400: ErrorSchema, 403: ErrorSchema, 404: ErrorSchema, 412: ErrorSchema, 500: ErrorSchema}, auth=django_auth, exclude_unset=True)
+@if_match(invoice_item_etag)
 def update_invoice_item(request, invoice_id: int, id: int, payload: InvoiceItemUpdate):
     if request.user.is_staff:
         invoice = get_object_or_404(Invoice, id=invoice_id)
@@ -404,8 +731,8 @@ def update_invoice_item(request, invoice_id: int, id: int, payload: InvoiceItemU
     for attr, value in data.items():
         setattr(item, attr, value)
     item.save()
-    invoice.save()
-    return item
+    invoice.update_totals()
+    return invoice_item_fieldset.select().from_instance(item)
 
 @api.delete("/invoices/{invoice_id}/items/{id}/", response={204: None, 403: ErrorSchema, 404: ErrorSchema, 500: ErrorSchema}, auth=django_auth)
 def delete_invoice_item(request, invoice_id: int, id: int):
@@ -415,7 +742,7 @@ def delete_invoice_item(request, invoice_id: int, id: int):
         invoice = get_object_or_404(Invoice, id=invoice_id, client__invoice_owner=request.user)
     item = get_object_or_404(InvoiceItem, id=id, invoice=invoice)
     item.delete()
-    invoice.save()
+    invoice.update_totals()
     return 204, None
 
 # -------------------------
@@ -433,10 +760,7 @@ def request_password_reset(request, payload: ForgotPasswordRequestSchema):
             f"{urlsafe_base64_encode(force_bytes(user.pk))}/"
             f"{default_token_generator.make_token(user)}"
         )
-        context = {"reset_link": reset_link, "user": user}
-        html_message = render_to_string("emails/password_reset_email.html", context)
-        plain_message = strip_tags(html_message)
-        user.email_user(subject="Password Reset Request", message=plain_message, html_message=html_message)
+        send_user_email(user, "Password Reset Request", "emails/password_reset_email.html", {"reset_link": reset_link, "user": user})
     except InvoiceOwner.DoesNotExist:
         pass
     return 200, {"detail": "If the email exists, a password reset link has been sent."}
@@ -460,11 +784,5 @@ def reset_password(request, payload: ResetPasswordSchema):
     user.set_password(payload.new_password)
     user.save()
 
-    try:
-        context = {"user": user, "settings": settings}
-        html_message = render_to_string("emails/password_reset_successful.html", context)
-        plain_message = strip_tags(html_message)
-        user.email_user(subject="Password Reset Successfully", message=plain_message, html_message=html_message)
-    except Exception:
-        pass
+    send_user_email(user, "Password Reset Successfully", "emails/password_reset_successful.html", {"user": user, "settings": settings})
     return 200, {"detail": "Password has been reset successfully."}
\ No newline at end of file
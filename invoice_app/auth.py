@@ -0,0 +1,14 @@
+from asgiref.sync import sync_to_async
+from ninja.security import SessionAuth
+
+
+class AsyncSessionAuth(SessionAuth):
+    """Session authentication for async endpoints; the session and user are loaded off the event loop."""
+
+    async def authenticate(self, request, key):
+        if await sync_to_async(lambda: request.user.is_authenticated)():
+            return request.user
+        return None
+
+
+async_django_auth = AsyncSessionAuth()
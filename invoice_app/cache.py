@@ -0,0 +1,142 @@
+import hashlib
+import inspect
+import os
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+from django.db import transaction
+
+GLOBAL_GENERATION_KEY = 'api:generation:global'
+STAFF_GENERATION_KEY = 'api:generation:staff'
+
+
+def owner_generation_key(owner_id):
+    return f'api:generation:owner:{owner_id}'
+
+
+def _new_generation():
+    # A fresh value rather than incr(): a lost concurrent update can never reuse an old generation
+    return time.time_ns()
+
+
+def generations(*keys):
+    """Current value of each generation key, creating missing ones."""
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _new_generation(), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def _bump(*keys):
+    value = _new_generation()
+    cache.set_many({key: value for key in keys}, timeout=None)
+
+
+def bump_owner(owner_id):
+    """
+    Invalidate cached API responses that can include the owner's data, once the
+    current transaction commits so no reader can cache pre-commit rows under
+    the new generation.
+    """
+    keys = [STAFF_GENERATION_KEY]
+    if owner_id is not None:
+        keys.append(owner_generation_key(owner_id))
+    transaction.on_commit(lambda: _bump(*keys))
+
+
+def bump_all():
+    """Invalidate every cached API response, e.g. after a bulk UPDATE that skips signals."""
+    transaction.on_commit(lambda: _bump(GLOBAL_GENERATION_KEY))
+
+
+def user_generations(user):
+    """The global generation and the one covering everything ``user`` can see: their own, or staff's."""
+    scope = STAFF_GENERATION_KEY if user.is_staff else owner_generation_key(user.pk)
+    return generations(GLOBAL_GENERATION_KEY, scope)
+
+
+def response_cache_key(request, view_name, kwargs):
+    user = request.user
+    # Generations are read before the view runs, so data read after a bump is never cached under an old key
+    versions = user_generations(user)
+    params = repr((sorted(request.GET.lists()), sorted((key, repr(value)) for key, value in kwargs.items())))
+    digest = hashlib.sha256(params.encode()).hexdigest()
+    return f'api:response:{view_name}:{user.pk}:{versions[0]}:{versions[1]}:{digest}'
+
+
+def cached_response(timeout=None):
+    """
+    Cache what a GET endpoint returns per user and query string. Entries are
+    keyed on the owner's generation (the staff generation for staff users), so
+    any write to the owner's clients, invoices or items retires them at once.
+
+    Goes directly under the ``@api.get`` decorator. Error responses returned as
+    ``(status, body)`` tuples are not cached. Async views are cached through
+    the cache's async methods.
+    """
+    def cacheable(result):
+        return not (isinstance(result, tuple) and result[0] != 200)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(request, **kwargs):
+                key = await sync_to_async(response_cache_key)(request, func.__qualname__, kwargs)
+                result = await cache.aget(key)
+                if result is None:
+                    result = await func(request, **kwargs)
+                    if cacheable(result):
+                        await cache.aset(key, result, timeout or settings.API_CACHE_TIMEOUT)
+                return result
+        else:
+            @wraps(func)
+            def wrapper(request, **kwargs):
+                key = response_cache_key(request, func.__qualname__, kwargs)
+                result = cache.get(key)
+                if result is None:
+                    result = func(request, **kwargs)
+                    if cacheable(result):
+                        cache.set(key, result, timeout or settings.API_CACHE_TIMEOUT)
+                return result
+        return wrapper
+    return decorator
+
+
+class FileCache(FileBasedCache):
+    """
+    Django's file-based cache, which lists the whole cache directory on every
+    set to decide whether to cull. This one checks on the first set and then
+    every ``CULL_EVERY`` sets (an ``OPTIONS`` entry, 100 by default), so each
+    instance can add at most that many entries past ``MAX_ENTRIES`` between
+    checks. Django makes one instance per thread.
+
+    ``incr()`` and ``decr()`` are atomic across processes: they hold a lock on
+    one file in the cache directory while they read and write the value.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_every = int(params.get('OPTIONS', {}).get('CULL_EVERY', 100))
+        self._sets = 0
+
+    def _cull(self):
+        due = self._sets % self._cull_every == 0
+        self._sets += 1
+        if due:
+            super()._cull()
+
+    def incr(self, key, delta=1, version=None):
+        self._createdir()
+        with open(os.path.join(self._dir, 'incr.lock'), 'a') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                return super().incr(key, delta, version)
+            finally:
+                locks.unlock(lock_file)
@@ -0,0 +1,160 @@
+import hashlib
+import inspect
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from .cache import user_generations
+from .models import InvoiceOwner, Client, Invoice, InvoiceItem
+from .renderers import JSON, preferred_media_type, with_response_arg
+
+# Bump when the shape of a response changes so clients do not keep stale bodies.
+ETAG_VERSION = 2
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha256(repr((ETAG_VERSION,) + parts).encode()).hexdigest()[:32]
+
+
+def _owned(queryset, request, owner_lookup):
+    if request.user.is_staff:
+        return queryset
+    return queryset.filter(**{owner_lookup: request.user})
+
+
+def _lock(queryset, for_update):
+    return queryset.select_for_update() if for_update else queryset
+
+
+# Detail ETags read a single row of timestamps through joins, never the related
+# objects themselves. They return None when the row is not visible so the view
+# can answer with its usual 404.
+
+def invoice_owner_etag(request, id, for_update=False, **kwargs):
+    if not request.user.is_staff and id != request.user.id:
+        return None
+    row = _lock(InvoiceOwner.objects.filter(id=id), for_update).values_list('id', 'updated_at').first()
+    return row and make_etag('invoice_owner', *row)
+
+
+def client_etag(request, id, for_update=False, **kwargs):
+    clients = _lock(_owned(Client.objects.filter(id=id), request, 'invoice_owner'), for_update)
+    row = clients.values_list('id', 'updated_at', 'invoice_owner__updated_at').first()
+    return row and make_etag('client', *row)
+
+
+def invoice_etag(request, id, for_update=False, **kwargs):
+    invoices = _lock(_owned(Invoice.objects.filter(id=id), request, 'client__invoice_owner'), for_update)
+    row = invoices.values_list('id', 'updated_at', 'client__updated_at', 'client__invoice_owner__updated_at').first()
+    return row and make_etag('invoice', *row)
+
+
+def invoice_item_etag(request, invoice_id, id, for_update=False, **kwargs):
+    items = InvoiceItem.objects.filter(id=id, invoice_id=invoice_id)
+    items = _lock(_owned(items, request, 'invoice__client__invoice_owner'), for_update)
+    row = items.values_list('id', 'updated_at').first()
+    return row and make_etag('invoice_item', *row)
+
+
+# List ETags come from the generations cache.py moves on every write the user
+# can see, so they cost two cache reads however many rows the user has. A
+# bulk UPDATE that sends no signals must call bump_all(), as for the cache.
+
+def list_etag(request, **kwargs):
+    return make_etag('list', request.user.pk, request.get_full_path(), *user_generations(request.user))
+
+
+def invoice_item_list_etag(request, invoice_id, **kwargs):
+    # None sends the view on to its 404 when the invoice is not visible
+    invoices = _owned(Invoice.objects.filter(id=invoice_id), request, 'client__invoice_owner')
+    if not invoices.exists():
+        return None
+    return list_etag(request)
+
+
+def _with_variant(etag, request):
+    """
+    Tag the ETag with the query string, since fields= and expand= change the body,
+    and with the negotiated media type. The variant follows a dot, so If-Match
+    can compare the resource version alone.
+    """
+    query = request.META.get('QUERY_STRING', '')
+    media_type = preferred_media_type(request)
+    if media_type != JSON:
+        query = f'{query}|{media_type}'
+    if not query:
+        return etag
+    return '%s.%s"' % (etag[:-1], hashlib.sha256(query.encode()).hexdigest()[:8])
+
+
+def _etag_matches(header, etag, ignore_variant=False):
+    if header.strip() == '*':
+        return True
+    tags = parse_etags(header)
+    if ignore_variant:
+        tags = [tag.split('.')[0] + '"' if '.' in tag else tag for tag in tags]
+    return etag in tags
+
+
+def _not_modified(request, response, etag):
+    """Set the ETag headers on ``response``, or return the 304 to send instead of running the view."""
+    if etag is None:
+        return None
+    etag = _with_variant(etag, request)
+    # Browsers then revalidate every fetch with If-None-Match on their own
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if _etag_matches(request.headers.get('If-None-Match', ''), etag):
+        return HttpResponse(status=304, headers=headers)
+    for header, value in headers.items():
+        response[header] = value
+    return None
+
+
+def etag_response(compute_etag):
+    """
+    Send an ETag with a GET endpoint's response and answer If-None-Match with an
+    empty 304 before the view runs, so nothing is loaded or serialized.
+    Goes directly under the ``@api.get`` decorator. For async views the ETag
+    query runs in a worker thread.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(request, response, **kwargs):
+                etag = await sync_to_async(compute_etag)(request, **kwargs)
+                return _not_modified(request, response, etag) or await func(request, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(request, response, **kwargs):
+                return _not_modified(request, response, compute_etag(request, **kwargs)) or func(request, **kwargs)
+        return with_response_arg(wrapper, func)
+    return decorator
+
+
+def if_match(compute_etag):
+    """
+    Reject a PATCH with 412 when its If-Match header no longer matches the
+    resource, and send the updated resource's ETag with the response. The check
+    and the write share a transaction with the row locked.
+    Goes directly under the ``@api.patch`` decorator.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(request, response, **kwargs):
+            with transaction.atomic():
+                header = request.headers.get('If-Match')
+                if header is not None:
+                    etag = compute_etag(request, for_update=True, **kwargs)
+                    if etag is not None and not _etag_matches(header, etag, ignore_variant=True):
+                        return 412, {"detail": "The resource has changed since it was fetched."}
+                result = func(request, **kwargs)
+
+            if not isinstance(result, tuple):
+                etag = compute_etag(request, **kwargs)
+                if etag is not None:
+                    response['ETag'] = etag
+            return result
+        return with_response_arg(wrapper, func)
+    return decorator
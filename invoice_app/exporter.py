@@ -0,0 +1,21 @@
+from django.db.models import Prefetch
+from .fieldsets import invoice_fieldset, invoice_item_fieldset
+from .models import InvoiceItem
+from .renderers import dumps
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def iter_invoice_lines(invoices, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one NDJSON line per invoice with its items embedded. Invoices are read
+    ``chunk_size`` at a time from a server-side cursor and each chunk's items are
+    fetched in one prefetch query, so memory stays flat however many there are.
+    """
+    invoice_fields = invoice_fieldset.select()
+    item_fields = invoice_item_fieldset.select()
+    items = Prefetch('items', queryset=InvoiceItem.objects.order_by('id'))
+    for invoice in invoices.order_by('id').prefetch_related(items).iterator(chunk_size=chunk_size):
+        line = invoice_fields.from_instance(invoice)
+        line['items'] = [item_fields.from_instance(item) for item in invoice.items.all()]
+        yield dumps(line) + b'\n'
@@ -0,0 +1,164 @@
+from django.db import models
+from ninja.errors import HttpError
+from .models import InvoiceOwner, Client, Invoice, InvoiceItem
+from .pagination import MAX_PAGE_SIZE
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+def parse_ids(value):
+    """Parse the ``ids=1,2,3`` query value of the list endpoints' multi-get form."""
+    try:
+        ids = {int(part) for part in _split(value)}
+    except ValueError:
+        raise HttpError(400, "ids must be a comma-separated list of integers.")
+    if len(ids) > MAX_PAGE_SIZE:
+        raise HttpError(400, f"At most {MAX_PAGE_SIZE} ids can be requested at once.")
+    return ids
+
+
+def _converter(field):
+    if isinstance(field, models.FileField):
+        def file_url(value):
+            name = getattr(value, 'name', value)
+            return field.storage.url(name) if name else None
+        return file_url
+    if isinstance(field, models.DecimalField):
+        # The response schemas declare decimals as floats
+        return float
+    if isinstance(field, models.DateField) and not isinstance(field, models.DateTimeField):
+        return lambda value: value.isoformat() if value else None
+    return None
+
+
+class Fieldset:
+    """
+    The columns an endpoint can return for a model and the foreign keys it can
+    expand into nested objects. Foreign keys are returned as ids unless expanded.
+    """
+
+    def __init__(self, model, fields, expandable=None):
+        self.model = model
+        self.fields = tuple(fields)
+        self.expandable = expandable or {}
+        self.converters = {}
+        for name in self.fields:
+            converter = _converter(model._meta.get_field(name))
+            if converter:
+                self.converters[name] = converter
+
+    def select(self, fields=None, expand=None):
+        """Parse ``fields=`` and ``expand=`` query values into a Selection."""
+        selected = self.fields
+        if fields:
+            names = set(_split(fields))
+            unknown = names - set(self.fields)
+            if unknown:
+                raise HttpError(400, f"Unknown field(s): {', '.join(sorted(unknown))}.")
+            selected = tuple(name for name in self.fields if name == 'id' or name in names)
+
+        tree = {}
+        for path in _split(expand):
+            node, fieldset = tree, self
+            for name in path.split('.'):
+                if name not in fieldset.expandable:
+                    raise HttpError(400, f"Cannot expand '{path}'.")
+                node, fieldset = node.setdefault(name, {}), fieldset.expandable[name]
+        return Selection(self, selected, tree)
+
+
+class Selection:
+    """
+    Selected fields and expansions for one request. Rows are fetched with
+    ``values()``, so only the selected columns are read, expansions are joined
+    into the same query and no model instances are built.
+    """
+
+    def __init__(self, fieldset, fields, expand):
+        self.fieldset = fieldset
+        self.fields = fields
+        self.expand = expand
+
+    def nested(self, name):
+        fieldset = self.fieldset.expandable[name]
+        return Selection(fieldset, fieldset.fields, self.expand[name])
+
+    def columns(self, prefix=''):
+        columns = [prefix + name for name in self.fields]
+        for name in self.expand:
+            columns += self.nested(name).columns(f'{prefix}{name}__')
+        return columns
+
+    def values(self, queryset, *extra):
+        """``queryset.values()`` limited to the selected columns, plus any ``extra`` ones."""
+        return queryset.values(*dict.fromkeys(self.columns() + list(extra)))
+
+    def build(self, row, prefix='', memo=None):
+        nested = {}
+        for name in self.expand:
+            nested_prefix = f'{prefix}{name}__'
+            key = (nested_prefix, row[nested_prefix + 'id'])
+            if memo is None:
+                nested[name] = self.nested(name).build(row, nested_prefix)
+            else:
+                # Many rows share a client or owner; build each nested object once
+                if key not in memo:
+                    memo[key] = self.nested(name).build(row, nested_prefix, memo)
+                nested[name] = memo[key]
+
+        converters = self.fieldset.converters
+        data = {}
+        for name in self.fields:
+            value = row[prefix + name]
+            data[name] = converters[name](value) if name in converters and value is not None else value
+            # Nested objects follow their id, in the order the response schemas declare them
+            if name.endswith('_id') and name[:-3] in nested:
+                data[name[:-3]] = nested.pop(name[:-3])
+        data.update(nested)
+        return data
+
+    def serialize(self, rows):
+        memo = {}
+        return [self.build(row, memo=memo) for row in rows]
+
+    def get(self, queryset):
+        """Fetch and serialize the single row of ``queryset``, or None."""
+        row = self.values(queryset).first()
+        return row and self.build(row)
+
+    def from_instance(self, obj):
+        """Serialize an already loaded instance; expansions are not applied."""
+        converters = self.fieldset.converters
+        data = {}
+        for name in self.fields:
+            value = getattr(obj, name)
+            data[name] = converters[name](value) if name in converters and value is not None else value
+        return data
+
+
+invoice_owner_fieldset = Fieldset(InvoiceOwner, [
+    'id', 'email', 'name', 'address', 'phone', 'phone_2', 'ntn_number', 'bank', 'account_title',
+    'iban', 'logo', 'signature', 'is_onboarded', 'is_staff', 'created_at', 'updated_at',
+])
+
+client_fieldset = Fieldset(Client, [
+    'id', 'invoice_owner_id', 'name', 'address', 'ntn_number', 'phone', 'created_at', 'updated_at',
+], expandable={'invoice_owner': invoice_owner_fieldset})
+
+invoice_fieldset = Fieldset(Invoice, [
+    'id', 'client_id', 'reference_number', 'tax_percentage', 'total_price', 'tax', 'grand_total', 'date',
+    'notes', 'is_taxed', 'is_paid', 'is_quotation', 'transit_charges', 'created_at', 'updated_at',
+], expandable={'client': client_fieldset})
+
+invoice_item_fieldset = Fieldset(InvoiceItem, [
+    'id', 'invoice_id', 'name', 'unit', 'description', 'quantity', 'unit_price', 'total_price', 'updated_at',
+], expandable={'invoice': invoice_fieldset})
+
+
+def paginated_serializer(fieldset):
+    """CursorPagination serializer that applies the request's fields= and expand=."""
+    def serialize(page, request, params):
+        return fieldset.select(params.get('fields'), params.get('expand')).serialize(page)
+    return serialize
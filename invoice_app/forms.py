@@ -1,6 +1,7 @@
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django import forms
-from .widgets import NoTrailingZeroNumberInput
+from django.urls import reverse_lazy
+from .widgets import NoTrailingZeroNumberInput, SuggestSelect
 from .models import Invoice, InvoiceOwner, InvoiceItem, Client
 
 class InvoiceForm(forms.ModelForm):
@@ -38,7 +39,12 @@ class InvoiceForm(forms.ModelForm):
         })
     )
 
-    client = forms.ModelChoiceField(queryset=Client.objects.all(), empty_label="Select Client or Create New", required=True, widget=forms.Select(attrs={'autofocus': True}))
+    client = forms.ModelChoiceField(
+        queryset=Client.objects.all(),
+        empty_label="Select Client or Create New",
+        required=True,
+        widget=SuggestSelect(reverse_lazy('api-1.0.0:suggest_client_names'), attrs={'autofocus': True}),
+    )
 
     def clean(self):
         cleaned_data = super().clean()
@@ -0,0 +1,237 @@
+import csv
+import io
+import json
+
+import pydantic
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Max
+from .cache import bump_owner
+from .models import Client, Invoice, InvoiceItem, ReferenceSequence, SearchTerm
+from .schemas import ClientCreate, InvoiceImportRow
+from .search import schedule_reindex
+from .suggest import invalidate_client_names
+from .sync import stamp_on_commit
+
+FORMATS = ('csv', 'ndjson')
+
+# Item columns accepted on CSV invoice rows; rows sharing an invoice_key form one invoice.
+CSV_ITEM_COLUMNS = {
+    'item_name': 'name',
+    'item_unit': 'unit',
+    'item_description': 'description',
+    'item_quantity': 'quantity',
+    'item_unit_price': 'unit_price',
+}
+
+# Stop collecting row errors past this point so a bad file cannot exhaust memory.
+MAX_REPORTED_ERRORS = 1000
+
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}.get(extension)
+
+
+def iter_records(stream, fmt):
+    """
+    Yield (row number, record) pairs from a binary stream one row at a time.
+    Malformed NDJSON lines are yielded as the exception instead of a record.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        # Row 1 is the header
+        for row_number, row in enumerate(csv.DictReader(text), start=2):
+            yield row_number, {key: value for key, value in row.items() if key and value not in ('', None)}
+    else:
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except ValueError as e:
+                yield row_number, e
+
+
+def group_csv_items(records):
+    """Fold the item columns of consecutive CSV rows with the same invoice_key into one record."""
+    current_key, current = None, None
+    for row_number, record in records:
+        item = {field: record.pop(column) for column, field in CSV_ITEM_COLUMNS.items() if column in record}
+        key = record.pop('invoice_key', None)
+        if current is not None and key is not None and key == current_key:
+            if item:
+                current[1]['items'].append(item)
+            continue
+        if current is not None:
+            yield current
+        record['items'] = [item] if item else []
+        current_key, current = key, (row_number, record)
+    if current is not None:
+        yield current
+
+
+class Importer:
+    """
+    Validates records one at a time and inserts the valid ones in batches,
+    each batch in its own transaction.
+    """
+    def __init__(self, owner, batch_size=1000):
+        self.owner = owner
+        self.batch_size = batch_size
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, records):
+        batch = []
+        for row_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise ValidationError(f"Invalid JSON: {record}")
+                if not isinstance(record, dict):
+                    raise ValidationError("Each row must be a JSON object.")
+                batch.append(self.build(record))
+            except pydantic.ValidationError as e:
+                self.add_error(row_number, [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()])
+            except ValidationError as e:
+                self.add_error(row_number, e.messages)
+
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+    def add_error(self, row_number, messages):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'detail': messages})
+
+    def build(self, record):
+        raise NotImplementedError
+
+    def flush(self, batch):
+        raise NotImplementedError
+
+
+class ClientImporter(Importer):
+    def build(self, record):
+        data = ClientCreate(**record)
+        client = Client(invoice_owner=self.owner, **data.dict())
+        client.full_clean(exclude=['invoice_owner'])
+        return client
+
+    def flush(self, batch):
+        clients = Client.objects.filter(invoice_owner=self.owner)
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Client.objects.bulk_create(batch)
+                ids = [client.pk for client in batch]
+            else:
+                # MySQL does not report the new ids; they are the owner's clients past the previous last one.
+                last_id = clients.aggregate(last_id=Max('id'))['last_id'] or 0
+                Client.objects.bulk_create(batch)
+                ids = list(clients.filter(id__gt=last_id).values_list('id', flat=True))
+            schedule_reindex(SearchTerm.CLIENT, *ids)
+            stamp_on_commit(Client, *ids)
+            invalidate_client_names(self.owner.pk)
+            bump_owner(self.owner.pk)
+        self.created += len(batch)
+
+
+class InvoiceImporter(Importer):
+    def __init__(self, owner, batch_size=1000):
+        super().__init__(owner, batch_size)
+        self.clients = Client.objects.filter(invoice_owner=owner)
+        self._client_ids = None
+        self._client_names = None
+
+    def resolve_client(self, data):
+        if data.client_id is not None:
+            if self._client_ids is None:
+                self._client_ids = set(self.clients.values_list('id', flat=True))
+            if data.client_id in self._client_ids:
+                return data.client_id
+            raise ValidationError(f"Client {data.client_id} not found.")
+        if data.client_name:
+            if self._client_names is None:
+                self._client_names = {}
+                for client_id, name in self.clients.order_by('-id').values_list('id', 'name'):
+                    self._client_names[name] = client_id  # Oldest client wins on duplicate names
+            if data.client_name in self._client_names:
+                return self._client_names[data.client_name]
+            raise ValidationError(f"Client named '{data.client_name}' not found.")
+        raise ValidationError("Either client_id or client_name is required.")
+
+    def build(self, record):
+        data = InvoiceImportRow(**record)
+        fields = data.dict(exclude={'client_id', 'client_name', 'items'}, exclude_none=True)
+        invoice = Invoice(client_id=self.resolve_client(data), **fields)
+        invoice.full_clean(exclude=['client', 'reference_number', 'total_price', 'tax', 'grand_total'])
+
+        items = [InvoiceItem(**item.dict()) for item in data.items]
+        messages = []
+        for index, item in enumerate(items, start=1):
+            try:
+                item.full_clean(exclude=['invoice', 'total_price'])
+            except ValidationError as e:
+                messages.extend(f"Item {index}: {message}" for message in e.messages)
+            else:
+                item.total_price = item.quantity * item.unit_price
+        if messages:
+            raise ValidationError(messages)
+
+        invoice.calculate_totals(items_total=sum(item.total_price for item in items))
+        return invoice, items
+
+    def flush(self, batch):
+        invoices = [invoice for invoice, _items in batch]
+        with transaction.atomic():
+            for is_quotation in (False, True):
+                documents = [invoice for invoice in invoices if invoice.is_quotation == is_quotation]
+                if not documents:
+                    continue
+                first = ReferenceSequence.objects.allocate(self.owner.pk, is_quotation, count=len(documents))
+                for number, invoice in enumerate(documents, start=first):
+                    invoice.reference_number = Invoice.format_reference_number(number, is_quotation)
+
+            Invoice.objects.bulk_create(invoices)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # Reference numbers are unique per owner, so they identify the new rows.
+                ids = dict(
+                    Invoice.objects.filter(
+                        client__invoice_owner=self.owner,
+                        reference_number__in=[invoice.reference_number for invoice in invoices],
+                    ).values_list('reference_number', 'id')
+                )
+                for invoice in invoices:
+                    invoice.pk = ids[invoice.reference_number]
+
+            items = []
+            for invoice, invoice_items in batch:
+                for item in invoice_items:
+                    item.invoice = invoice
+                    items.append(item)
+            InvoiceItem.objects.bulk_create(items, batch_size=self.batch_size)
+            invoice_ids = [invoice.pk for invoice in invoices]
+            schedule_reindex(SearchTerm.INVOICE, *invoice_ids)
+            stamp_on_commit(Invoice, *invoice_ids)
+            stamp_on_commit(InvoiceItem, *invoice_ids, field='invoice_id')
+            bump_owner(self.owner.pk)
+        self.created += len(invoices)
+
+
+IMPORTERS = {
+    'clients': ClientImporter,
+    'invoices': InvoiceImporter,
+}
+
+
+def import_records(kind, owner, stream, fmt, batch_size=1000):
+    """Import a CSV or NDJSON stream of clients or invoices and return a report."""
+    records = iter_records(stream, fmt)
+    if kind == 'invoices' and fmt == 'csv':
+        records = group_csv_items(records)
+    return IMPORTERS[kind](owner, batch_size).run(records)
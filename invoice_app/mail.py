@@ -0,0 +1,27 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+# SMTP round trips happen here instead of in the request. The pool is small so a
+# burst of resets cannot open many connections to the mail server at once.
+_mail_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='mail')
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error("Sending email failed.", exc_info=future.exception())
+
+
+def send_user_email(user, subject, template, context):
+    """
+    Render ``template`` now and email it to ``user`` from a background thread,
+    so the request neither waits on the mail server nor fails with it.
+    """
+    html_message = render_to_string(template, context)
+    future = _mail_pool.submit(user.email_user, subject=subject, message=strip_tags(html_message), html_message=html_message)
+    future.add_done_callback(_log_failure)
+    return future
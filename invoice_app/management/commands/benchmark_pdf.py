@@ -0,0 +1,171 @@
+import io
+import json
+import resource
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from PIL import Image
+from invoice_app.models import InvoiceOwner, Client, Invoice, InvoiceItem
+from invoice_app.pdf import get_render_pool, pdf_cache, render_html_to_pdf, render_invoice_html
+from invoice_app.views import InvoicePDFView
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def _render_peak_rss(html):
+    """
+    Render ``html`` and return this process's peak RSS before and after, in
+    kilobytes (as Linux reports ru_maxrss). Run in a fresh render worker, so
+    the peak covers only this render and the worker's warm-up, and includes
+    what the C libraries under WeasyPrint allocate.
+    """
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    render_html_to_pdf(html)
+    return before, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _peak_rss_in_child(html):
+    with get_render_pool(max_workers=1) as pool:
+        return pool.submit(_render_peak_rss, html).result()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark invoice PDF rendering for invoices of increasing size and report "
+        "timings, peak memory per render and PDF size as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, nargs='+', default=[1, 10, 100, 1000], help="Item counts to benchmark.")
+        parser.add_argument('--repeat', type=int, default=3, help="Timed runs per item count; the median is reported.")
+        parser.add_argument('--output', help="Write the JSON report to this file as well as stdout.")
+        parser.add_argument('--baseline', help="JSON report from a previous run to compare against.")
+        parser.add_argument(
+            '--max-regression', type=float, default=0.25,
+            help="Fail when a timing exceeds the baseline by more than this fraction (default 0.25).",
+        )
+
+    def handle(self, *args, **options):
+        view = InvoicePDFView.as_view()
+        factory = RequestFactory()
+        results = []
+
+        with transaction.atomic():
+            owner = self.create_owner()
+            try:
+                for count in options['items']:
+                    invoice = self.create_invoice(owner, count)
+                    results.append(self.benchmark(invoice, count, options['repeat'], view, factory))
+            finally:
+                owner.logo.delete(save=False)
+                transaction.set_rollback(True)
+
+        report = {'repeat': options['repeat'], 'results': results}
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+
+        if options['baseline']:
+            self.check_regressions(results, options['baseline'], options['max_regression'])
+
+    def create_owner(self):
+        owner = InvoiceOwner.objects.create(
+            email=f"benchmark-{uuid.uuid4().hex}@example.invalid",
+            name="Benchmark Owner",
+            address="1 Benchmark Road",
+            phone="+923001234567",
+            ntn_number="1234567",
+            bank="Benchmark Bank",
+            account_title="Benchmark",
+            iban="PK00BENCH0000000000000000",
+        )
+        logo = io.BytesIO()
+        Image.new('RGB', (500, 500), 'navy').save(logo, format='PNG')
+        owner.logo.save('logo.png', ContentFile(logo.getvalue()))
+        return owner
+
+    def create_invoice(self, owner, count):
+        client = Client.objects.create(name=f"Benchmark Client {count}", address="2 Client Street", invoice_owner=owner)
+        invoice = Invoice(client=client, tax_percentage=Decimal('17'), notes="Synthetic benchmark invoice.")
+        invoice.save()
+
+        items = []
+        for i in range(count):
+            item = InvoiceItem(
+                invoice=invoice,
+                name=f"Item {i + 1}",
+                description="Synthetic line item used for PDF benchmarking.",
+                unit="pc(s)",
+                quantity=Decimal(i % 7 + 1),
+                unit_price=Decimal('149.990'),
+            )
+            item.total_price = item.quantity * item.unit_price
+            items.append(item)
+        InvoiceItem.objects.bulk_create(items, batch_size=500)
+
+        invoice.save()
+        return Invoice.objects.select_related('client__invoice_owner').get(pk=invoice.pk)
+
+    def benchmark(self, invoice, count, repeat, view, factory):
+        template_times, pdf_times, cold_times, warm_times = [], [], [], []
+        pdf_size = 0
+
+        for _ in range(repeat):
+            seconds, html = _timed(render_invoice_html, invoice)
+            template_times.append(seconds)
+            seconds, pdf = _timed(render_html_to_pdf, html)
+            pdf_times.append(seconds)
+            pdf_size = len(pdf)
+
+            # End to end through InvoicePDFView, first with an empty cache and then cached.
+            pdf_cache.invalidate_invoice(invoice.pk)
+            for times in (cold_times, warm_times):
+                request = factory.get(f"/invoice/{invoice.pk}/pdf/")
+                seconds, _pdf = _timed(lambda: b''.join(view(request, pk=invoice.pk).streaming_content))
+                times.append(seconds)
+        pdf_cache.invalidate_invoice(invoice.pk)
+        # The benchmark's rows are never committed, so the child is handed the HTML
+        rss_before_kb, rss_peak_kb = _peak_rss_in_child(render_invoice_html(invoice))
+
+        return {
+            'items': count,
+            'template_seconds': statistics.median(template_times),
+            'write_pdf_seconds': statistics.median(pdf_times),
+            'view_cold_seconds': statistics.median(cold_times),
+            'view_cached_seconds': statistics.median(warm_times),
+            'render_peak_rss_kb': rss_peak_kb,
+            'render_rss_growth_kb': rss_peak_kb - rss_before_kb,
+            'pdf_bytes': pdf_size,
+        }
+
+    def check_regressions(self, results, baseline_path, max_regression):
+        with open(baseline_path) as f:
+            baseline = {row['items']: row for row in json.load(f)['results']}
+
+        failures = []
+        for row in results:
+            previous = baseline.get(row['items'])
+            if not previous:
+                continue
+            for key in ('template_seconds', 'write_pdf_seconds', 'view_cold_seconds', 'view_cached_seconds'):
+                limit = previous[key] * (1 + max_regression)
+                if row[key] > limit:
+                    failures.append(
+                        f"{row['items']} items: {key} {row[key]:.4f}s exceeds baseline {previous[key]:.4f}s "
+                        f"by more than {max_regression:.0%}"
+                    )
+
+        if failures:
+            raise CommandError("PDF rendering regressed:\n" + "\n".join(failures))
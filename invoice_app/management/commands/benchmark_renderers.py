@@ -0,0 +1,94 @@
+import datetime
+import json
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from ninja.renderers import JSONRenderer
+from invoice_app.fieldsets import invoice_fieldset
+from invoice_app.models import InvoiceOwner, Client, Invoice
+from invoice_app.renderers import MSGPACK, ORJSONRenderer, MsgPackRenderer
+from invoice_app.schemas import InvoiceOut
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API renderers on an invoice list page with expanded clients "
+        "and report timings, throughput and body size as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=1000, help="Invoices in the rendered list.")
+        parser.add_argument('--repeat', type=int, default=50, help="Timed renders per renderer; the median is reported.")
+        parser.add_argument('--output', help="Write the JSON report to this file as well as stdout.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            try:
+                data = self.build_page(options['invoices'])
+            finally:
+                transaction.set_rollback(True)
+
+        request = RequestFactory().get('/api/invoices/', HTTP_ACCEPT=MSGPACK)
+        renderers = {'ninja_json': JSONRenderer(), 'orjson': ORJSONRenderer(), 'msgpack': MsgPackRenderer()}
+
+        results = [
+            self.benchmark(name, renderer, request, data, options['repeat'])
+            for name, renderer in renderers.items()
+        ]
+        baseline = results[0]['median_seconds']
+        for row in results:
+            row['speedup'] = round(baseline / row['median_seconds'], 2)
+
+        report = {'invoices': options['invoices'], 'repeat': options['repeat'], 'results': results}
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+
+    def build_page(self, count):
+        owner = InvoiceOwner.objects.create(email=f"benchmark-{uuid.uuid4().hex}@example.invalid", name="Benchmark Owner")
+        clients = Client.objects.bulk_create([
+            Client(name=f"Benchmark Client {i}", address="2 Client Street", invoice_owner=owner) for i in range(20)
+        ])
+        Invoice.objects.bulk_create([
+            Invoice(
+                client=clients[i % len(clients)],
+                reference_number=Invoice.format_reference_number(i + 1),
+                tax_percentage=Decimal('17'),
+                total_price=Decimal('1499.900'),
+                tax=Decimal('254.983'),
+                grand_total=Decimal('1754.883'),
+                date=datetime.date.today(),
+                notes="Synthetic benchmark invoice.",
+                is_taxed=True,
+            )
+            for i in range(count)
+        ], batch_size=500)
+
+        # The same rows, serialized and validated the way the invoice list endpoint does it
+        selection = invoice_fieldset.select(expand='client')
+        rows = selection.serialize(selection.values(Invoice.objects.filter(client__invoice_owner=owner)))
+        items = [InvoiceOut.model_validate(row).model_dump(exclude_unset=True) for row in rows]
+        return {'items': items, 'next': None, 'previous': None}
+
+    def benchmark(self, name, renderer, request, data, repeat):
+        times = []
+        body = b''
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = renderer.render(request, data, response_status=200)
+            times.append(time.perf_counter() - start)
+
+        median = statistics.median(times)
+        return {
+            'renderer': name,
+            'median_seconds': median,
+            'renders_per_second': round(1 / median, 1),
+            'bytes': len(body),
+        }
@@ -0,0 +1,100 @@
+import json
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client as HttpClient
+from django.test.utils import override_settings
+from invoice_app.models import InvoiceOwner, Client, Invoice, InvoiceItem
+
+# A private cache, so nothing the benchmark caches outlives its rolled back rows
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the API read endpoints with and without response schema validation "
+        "(API_TRUSTED_RESPONSES) and report per-endpoint medians as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=200, help="Invoices created for the benchmark owner.")
+        parser.add_argument('--items', type=int, default=20, help="Items per invoice.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per endpoint and mode.")
+        parser.add_argument('--output', help="Write the JSON report to this file as well as stdout.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), override_settings(CACHES=BENCHMARK_CACHES):
+            try:
+                owner, invoice = self.create_data(options['invoices'], options['items'])
+                http = HttpClient()
+                http.force_login(owner)
+                item_id = invoice.items.values_list('id', flat=True).first()
+                endpoints = [
+                    '/api/v1/invoice-owners/',
+                    f'/api/v1/invoice-owners/{owner.pk}/',
+                    '/api/v1/clients/?limit=200&expand=invoice_owner',
+                    f'/api/v1/clients/{invoice.client_id}/?expand=invoice_owner',
+                    '/api/v1/invoices/?limit=200',
+                    '/api/v1/invoices/?limit=200&expand=client.invoice_owner',
+                    f'/api/v1/invoices/{invoice.pk}/?expand=client.invoice_owner',
+                    f'/api/v1/invoices/{invoice.pk}/items/?limit=200',
+                    f'/api/v1/invoices/{invoice.pk}/items/{item_id}/',
+                ]
+                results = [self.benchmark(http, url, options['repeat']) for url in endpoints]
+            finally:
+                transaction.set_rollback(True)
+
+        report = {'invoices': options['invoices'], 'items': options['items'], 'repeat': options['repeat'], 'results': results}
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+
+    def create_data(self, invoice_count, item_count):
+        owner = InvoiceOwner.objects.create(
+            email=f"benchmark-{uuid.uuid4().hex}@example.invalid", name="Benchmark Owner", phone="+923001234567",
+        )
+        clients = Client.objects.bulk_create([
+            Client(name=f"Benchmark Client {i}", address="2 Client Street", invoice_owner=owner) for i in range(20)
+        ])
+        invoices = Invoice.objects.bulk_create([
+            Invoice(
+                client=clients[i % len(clients)],
+                reference_number=Invoice.format_reference_number(i + 1),
+                tax_percentage=Decimal('17'),
+                notes="Synthetic benchmark invoice.",
+            )
+            for i in range(invoice_count)
+        ], batch_size=500)
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(
+                invoice=invoice, name=f"Item {i + 1}", unit="pc(s)",
+                quantity=Decimal(i % 7 + 1), unit_price=Decimal('149.990'), total_price=Decimal(i % 7 + 1) * Decimal('149.990'),
+            )
+            for invoice in invoices[:1]
+            for i in range(item_count)
+        ], batch_size=500)
+        return owner, invoices[0]
+
+    def benchmark(self, http, url, repeat):
+        row = {'endpoint': url}
+        for mode, trusted in (('validated', False), ('trusted', True)):
+            with override_settings(API_TRUSTED_RESPONSES=trusted):
+                # The first request fills the cache, so the timed ones measure validation and rendering
+                response = http.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"{url} answered {response.status_code}: {response.content[:200]!r}")
+                times = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    http.get(url)
+                    times.append(time.perf_counter() - start)
+            row[f'{mode}_seconds'] = statistics.median(times)
+        row['saved_seconds'] = row['validated_seconds'] - row['trusted_seconds']
+        row['saved_percent'] = round(100 * row['saved_seconds'] / row['validated_seconds'], 1)
+        return row
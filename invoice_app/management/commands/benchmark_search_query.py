@@ -0,0 +1,85 @@
+import json
+import statistics
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from invoice_app.search_query import invoice_query_parser
+
+# Typed into the invoice list's search box: free text, dates in several forms, reference numbers and qualifiers
+QUERIES = [
+    "acme",
+    "copper wire",
+    "15",
+    "2024-03-15",
+    "15 march 2024",
+    "15-03-24",
+    "I_SAE-0042",
+    "1,250.00",
+    "client:acme paid:no",
+    "quotation:yes 2024-03-15 cable",
+]
+
+# The formats the list views used to try one by one
+LEGACY_FORMATS = [
+    "%Y-%m-%d",
+    "%d-%b", "%d %b", "%d-%B", "%d %B",
+    "%d-%m", "%d %m",
+    "%d-%b-%y", "%d %b %y", "%d-%B-%y", "%d %B %y",
+    "%d-%b-%Y", "%d %b %Y", "%d-%B-%Y", "%d %B %Y",
+    "%d-%m-%y", "%d %m %y", "%d-%m-%Y", "%d %m %Y",
+]
+
+
+def legacy_parse(strval):
+    """What InvoiceListView.build_query did before touching the database: classify the input as one term."""
+    if strval.isdigit():
+        return ('day', int(strval)) if 1 <= int(strval) <= 31 else ('text', strval)
+    for fmt in LEGACY_FORMATS:
+        try:
+            return ('date', datetime.strptime(strval, fmt))
+        except ValueError:
+            continue
+    return ('text', strval)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark parsing search box input with the compiled query parser against the "
+        "try-every-strptime-format approach it replaced, and report per-query timings as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000, help="Parses per query per round.")
+        parser.add_argument('--rounds', type=int, default=5, help="Timed rounds; the median is reported.")
+        parser.add_argument('--output', help="Write the JSON report to this file as well as stdout.")
+
+    def handle(self, *args, **options):
+        results = []
+        for query in QUERIES:
+            legacy = self.benchmark(legacy_parse, query, options['repeat'], options['rounds'])
+            parser = self.benchmark(invoice_query_parser.parse, query, options['repeat'], options['rounds'])
+            results.append({
+                'query': query,
+                'legacy_microseconds': round(legacy * 1e6, 2),
+                'parser_microseconds': round(parser * 1e6, 2),
+                'speedup': round(legacy / parser, 2),
+                'terms': [list(map(str, term)) for term in invoice_query_parser.parse(query)],
+            })
+
+        report = {'repeat': options['repeat'], 'rounds': options['rounds'], 'results': results}
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+
+    def benchmark(self, parse, query, repeat, rounds):
+        """Median seconds per parse."""
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                parse(query)
+            times.append((time.perf_counter() - start) / repeat)
+        return statistics.median(times)
@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from invoice_app.importer import FORMATS, IMPORTERS, guess_format, import_records
+from invoice_app.models import InvoiceOwner
+
+
+class Command(BaseCommand):
+    help = "Stream clients or invoices from a CSV or NDJSON file into an owner's account."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--owner', required=True, help="Email of the invoice owner to import into.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows inserted per transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            owner = InvoiceOwner.objects.get(email=options['owner'])
+        except InvoiceOwner.DoesNotExist:
+            raise CommandError(f"No invoice owner with email {options['owner']}.")
+
+        fmt = options['format'] or guess_format(options['path'])
+        if fmt not in FORMATS:
+            raise CommandError("Cannot tell the file format; pass --format csv or --format ndjson.")
+
+        with open(options['path'], 'rb') as stream:
+            report = import_records(options['kind'], owner, stream, fmt, options['batch_size'])
+
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Imported {report['created']} {options['kind']}, {report['failed']} row(s) failed."))
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a running API server: keep N connections busy with GET requests "
+        "for each concurrency level and report throughput and latency as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="URL to request, e.g. http://127.0.0.1:8000/api/v1/invoices/")
+        parser.add_argument('--concurrency', default='1,8,32', help="Comma-separated connection counts to run.")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds to run each concurrency level.")
+        parser.add_argument('--session', help="Session cookie value to send, for endpoints that need a login.")
+        parser.add_argument('--output', help="Write the JSON report to this file as well as stdout.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("Only plain http:// URLs are supported.")
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of integers.")
+
+        headers = [f"GET {url.path or '/'}{'?' + url.query if url.query else ''} HTTP/1.1", f"Host: {url.netloc}", "Accept: application/json"]
+        if options['session']:
+            headers.append(f"Cookie: sessionid={options['session']}")
+        request = ("\r\n".join(headers) + "\r\n\r\n").encode()
+
+        results = [
+            asyncio.run(self.run_level(url.hostname, url.port or 80, request, level, options['duration']))
+            for level in levels
+        ]
+        report = {'url': options['url'], 'duration': options['duration'], 'results': results}
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+
+    async def run_level(self, host, port, request, concurrency, duration):
+        latencies, errors = [], []
+        deadline = time.perf_counter() + duration
+
+        async def client():
+            reader = writer = None
+            while time.perf_counter() < deadline:
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(host, port)
+                    started = time.perf_counter()
+                    writer.write(request)
+                    status, keep_alive = await self.read_response(reader)
+                    latencies.append(time.perf_counter() - started)
+                    if status != 200:
+                        errors.append(status)
+                    if not keep_alive:
+                        writer.close()
+                        writer = None
+                except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                    errors.append(type(e).__name__)
+                    writer = None
+            if writer is not None:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        row = {'concurrency': concurrency, 'requests': len(latencies), 'errors': len(errors)}
+        row['requests_per_second'] = round(len(latencies) / elapsed, 1)
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100)
+            row['p50_ms'] = round(cuts[49] * 1000, 2)
+            row['p95_ms'] = round(cuts[94] * 1000, 2)
+        return row
+
+    async def read_response(self, reader):
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            while size := int((await reader.readuntil(b"\r\n")).split(b';')[0], 16):
+                await reader.readexactly(size + 2)
+            await reader.readuntil(b"\r\n")
+        elif 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        else:
+            await reader.read()
+            return status, False
+        return status, headers.get('connection') != 'close'
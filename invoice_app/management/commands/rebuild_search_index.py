@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from invoice_app.models import Client, Invoice, SearchTerm
+from invoice_app.search import reindex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index for every client and invoice, e.g. after a bulk load that skipped signals."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Clients or invoices reindexed per transaction.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for kind, model in ((SearchTerm.CLIENT, Client), (SearchTerm.INVOICE, Invoice)):
+            ids = list(model.objects.order_by('id').values_list('id', flat=True))
+            for start in range(0, len(ids), batch_size):
+                reindex(kind, ids[start:start + batch_size])
+            # Terms of rows deleted while signals were not running
+            stale, _ = SearchTerm.objects.filter(kind=kind).exclude(object_id__in=model.objects.values('id')).delete()
+            self.stdout.write(f"Reindexed {len(ids)} {model._meta.verbose_name_plural}, dropped {stale} stale term(s).")
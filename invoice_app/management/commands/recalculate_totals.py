@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Max, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+from invoice_app.cache import bump_all
+from invoice_app.models import Invoice, InvoiceItem
+
+AMOUNT = DecimalField(max_digits=16, decimal_places=3)
+
+
+def totals_expressions(stamp):
+    """
+    SQL expressions equivalent to Invoice.calculate_totals(), so totals can be
+    repaired with UPDATE statements instead of loading invoices into Python.
+    Invoices whose totals change get ``stamp`` as their ``updated_at``.
+    """
+    items_total = (
+        InvoiceItem.objects.filter(invoice=OuterRef('pk'))
+        .values('invoice')
+        .annotate(total=Sum('total_price'))
+        .values('total')
+    )
+    total_price = ExpressionWrapper(
+        Coalesce(Subquery(items_total), Value(Decimal(0)), output_field=AMOUNT)
+        + Coalesce(F('transit_charges'), Value(Decimal(0)), output_field=AMOUNT),
+        output_field=AMOUNT,
+    )
+    tax = Case(
+        When(tax_percentage__gt=0, then=Round(total_price * F('tax_percentage') / Value(Decimal(100)), 3)),
+        default=Value(Decimal(0)),
+        output_field=AMOUNT,
+    )
+    grand_total = ExpressionWrapper(total_price + tax, output_field=AMOUNT)
+    unchanged = Q(total_price=total_price, tax=tax, grand_total=grand_total)
+    return {
+        # Invoices whose totals were wrong are reported by /sync as changed. MySQL applies SET
+        # clauses in order, so this one comes first and still compares against the old totals.
+        'updated_at': Case(When(unchanged, then=F('updated_at')), default=Value(stamp)),
+        'total_price': total_price,
+        'tax': tax,
+        # Repeat the expressions rather than reference the columns: MySQL applies SET clauses in order.
+        'grand_total': grand_total,
+    }
+
+
+class Command(BaseCommand):
+    help = "Recalculate total_price, tax and grand_total for every invoice in set-based batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help="Invoice ids covered by each UPDATE.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bounds = Invoice.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write("No invoices to update.")
+            return
+
+        updated = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            batch = Invoice.objects.filter(id__gte=start, id__lt=start + batch_size)
+            stamp = timezone.now()
+            with transaction.atomic():
+                updated += batch.update(**totals_expressions(stamp))
+            # Stamp the repaired invoices again now they are committed, so no sync cursor has passed them
+            batch.filter(updated_at=stamp).update(updated_at=timezone.now())
+            self.stdout.write(f"Updated invoices {start} to {min(start + batch_size, bounds['last'] + 1) - 1}")
+
+        # UPDATE statements send no signals, so retire every cached API response at once
+        bump_all()
+        self.stdout.write(self.style.SUCCESS(f"Recalculated totals for {updated} invoice(s)."))
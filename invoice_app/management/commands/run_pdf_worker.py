@@ -0,0 +1,54 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from invoice_app.models import PDFJob
+from invoice_app.pdf import get_render_pool, render_invoice_to_cache
+
+
+class Command(BaseCommand):
+    help = "Render queued invoice PDF jobs in a local process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help="Number of render processes (defaults to the number of CPUs).")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait between queue polls.")
+        parser.add_argument('--stale-after', type=int, default=600, help="Requeue jobs left running for this many seconds.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        processes = options['processes'] or os.cpu_count() or 1
+        poll_interval = options['poll_interval']
+
+        requeued = PDFJob.objects.requeue_stale(timedelta(seconds=options['stale_after']))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        running = {}
+        with get_render_pool(processes) as pool:
+            while True:
+                free = processes - len(running)
+                if free > 0:
+                    for job in PDFJob.objects.claim(free):
+                        running[pool.submit(render_invoice_to_cache, job.invoice_id)] = job
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.finish(running.pop(future), future)
+
+    def finish(self, job, future):
+        try:
+            fields = {'status': PDFJob.DONE, 'fingerprint': future.result(), 'error': None}
+        except Exception as e:
+            fields = {'status': PDFJob.FAILED, 'error': str(e)}
+        # The job disappears if its invoice was deleted mid-render; update() just matches no rows then.
+        PDFJob.objects.filter(pk=job.pk).update(updated_at=timezone.now(), **fields)
+        self.stdout.write(f"PDF job {job.pk} for invoice {job.invoice_id}: {fields['status']}")
@@ -1,4 +1,7 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -32,4 +35,63 @@ class CustomUserManager(BaseUserManager):
             raise ValueError(_("Superuser must have is_staff=True."))
         if extra_fields.get("is_superuser") is not True:
             raise ValueError(_("Superuser must have is_superuser=True."))
-        return self.create_user(email, password, **extra_fields)
\ No newline at end of file
+        return self.create_user(email, password, **extra_fields)
+
+
+class PDFJobManager(models.Manager):
+    """
+    Treats the PDFJob table as a work queue for the PDF render worker.
+    """
+    def claim(self, limit):
+        """
+        Mark up to `limit` queued jobs as running and return them, oldest first.
+        Each job is claimed with a conditional UPDATE so concurrent workers never
+        pick up the same job.
+        """
+        candidates = self.filter(status=self.model.QUEUED).order_by('created_at').values_list('id', flat=True)[:limit]
+        claimed = [
+            job_id for job_id in candidates
+            if self.filter(id=job_id, status=self.model.QUEUED).update(status=self.model.RUNNING, updated_at=timezone.now())
+        ]
+        return list(self.filter(id__in=claimed).order_by('created_at'))
+
+    def requeue_stale(self, older_than):
+        """
+        Put jobs left running by a worker that died back on the queue.
+        """
+        return self.filter(
+            status=self.model.RUNNING, updated_at__lt=timezone.now() - older_than
+        ).update(status=self.model.QUEUED, updated_at=timezone.now())
+
+
+
+class ReferenceSequenceManager(models.Manager):
+    """
+    Hands out invoice and quotation reference numbers per owner.
+    """
+    def allocate(self, owner_id, is_quotation, count=1):
+        """
+        Reserve `count` consecutive numbers and return the first one. The increment
+        is a single UPDATE, so concurrent callers are serialized by the row lock.
+        """
+        sequence = self.filter(invoice_owner_id=owner_id, is_quotation=is_quotation)
+        with transaction.atomic():
+            if not sequence.update(last_number=F('last_number') + count):
+                self._create(owner_id, is_quotation)
+                sequence.update(last_number=F('last_number') + count)
+            last_number = sequence.values_list('last_number', flat=True).get()
+        return last_number - count + 1
+
+    def _create(self, owner_id, is_quotation):
+        from .models import Invoice
+
+        # Continue from the numbers the owner already used before sequences existed.
+        references = Invoice.objects.filter(
+            client__invoice_owner=owner_id, is_quotation=is_quotation
+        ).values_list('reference_number', flat=True)
+        last_number = max((Invoice.parse_reference_number(ref) for ref in references), default=0)
+        try:
+            with transaction.atomic():
+                self.create(invoice_owner_id=owner_id, is_quotation=is_quotation, last_number=last_number)
+        except IntegrityError:
+            pass  # Another request created it first
@@ -1,9 +1,11 @@
+from decimal import ROUND_HALF_UP, Decimal
 from django.db import models
+from django.db.models import Sum
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from django.contrib.auth.models import AbstractUser
-from .managers import CustomUserManager
+from .managers import CustomUserManager, PDFJobManager, ReferenceSequenceManager
 from .utils import upload_logo, upload_sign, validate_phone_number
 from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFill
@@ -55,6 +57,9 @@ class InvoiceOwner(AbstractUser):
 
     class Meta:
         verbose_name = "Invoice Owner"
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='invoice_owner_updated_idx'),
+        ]
 
     def clean(self):
         super().clean()
@@ -82,6 +87,9 @@ class Client(models.Model):
 
     class Meta:
         ordering = ('-updated_at',)
+        indexes = [
+            models.Index(fields=['invoice_owner', 'updated_at', 'id'], name='client_owner_updated_idx'),
+        ]
 
     def clean(self):
         if self.phone:
@@ -94,6 +102,22 @@ class Client(models.Model):
         return self.name
 
 
+class ReferenceSequence(models.Model):
+    invoice_owner = models.ForeignKey(InvoiceOwner, on_delete=models.CASCADE, related_name="reference_sequences")
+    is_quotation = models.BooleanField(default=False)
+    last_number = models.PositiveIntegerField(default=0)
+
+    objects = ReferenceSequenceManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['invoice_owner', 'is_quotation'], name='unique_reference_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.invoice_owner} {'quotations' if self.is_quotation else 'invoices'}: {self.last_number}"
+
+
 class Invoice(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name="invoices")
     reference_number = models.CharField(max_length=14, editable=False)
@@ -112,56 +136,92 @@ class Invoice(models.Model):
     is_paid = models.BooleanField(default=False)
     transit_charges = models.DecimalField(max_digits=16, default=0, decimal_places=3, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='invoice_updated_idx'),
+            models.Index(fields=['client', 'updated_at', 'id'], name='invoice_client_updated_idx'),
+        ]
+
     def clean(self):
         """Validate tax_percentage."""
         if self.tax_percentage and not (0 <= self.tax_percentage <= 100):
             raise ValidationError(_("Tax percentage must be between 0 and 100."))
 
-    def calculate_totals(self):
-        """Calculate total_price, tax, and grand_total."""
-        self.total_price = sum(item.total_price for item in self.items.all())
-        
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored type so save() can spot a quotation/invoice switch without re-reading the row.
+        instance._loaded_is_quotation = instance.__dict__.get('is_quotation')
+        return instance
+
+    def calculate_totals(self, items_total=None):
+        """
+        Calculate total_price, tax, and grand_total with a single SUM over the items.
+        Pass items_total when the items are not in the database yet.
+        """
+        if items_total is None and self.pk:
+            items_total = self.items.aggregate(total=Sum('total_price'))['total']
+        self.total_price = items_total or Decimal(0)
+
         if self.transit_charges:
             self.total_price += self.transit_charges
  
-        self.tax = self.total_price * (self.tax_percentage / 100) if self.tax_percentage else 0
+        # Rounded half up to the column's 3 places before adding, as recalculate_totals does in SQL
+        self.tax = (
+            (self.total_price * self.tax_percentage / 100).quantize(Decimal('0.001'), rounding=ROUND_HALF_UP)
+            if self.tax_percentage else Decimal(0)
+        )
         self.grand_total = self.total_price + self.tax
 
+    def update_totals(self):
+        """Recalculate totals after item changes and write only the total columns."""
+        self.calculate_totals()
+        self.save(update_fields=['total_price', 'tax', 'grand_total', 'updated_at'])
+
     @staticmethod
-    def get_next_reference_number(last_invoice=None, is_quotation=False):
-        """Generate the next reference number in sequence."""
-        
-        if last_invoice:
-            last_number = int(last_invoice.reference_number.split('-')[1])
-            next_number = last_number + 1
-        else:
-            next_number = 1
-        
+    def format_reference_number(number, is_quotation=False):
         if is_quotation:
-            return f"Q_SAE-{next_number:04d}"  # Quotation reference number (Q_SAE-xxxx)
+            return f"Q_SAE-{number:04d}"  # Quotation reference number (Q_SAE-xxxx)
         else:
-            return f"I_SAE-{next_number:04d}"  # Invoice reference number (I_SAE-xxxx)
+            return f"I_SAE-{number:04d}"  # Invoice reference number (I_SAE-xxxx)
+
+    @staticmethod
+    def parse_reference_number(reference_number):
+        """Return the numeric part of a reference number, or 0 if it has none."""
+        try:
+            return int(reference_number.split('-')[1])
+        except (IndexError, ValueError):
+            return 0
+
+    @staticmethod
+    def get_next_reference_number(owner_id, is_quotation=False):
+        """Allocate the next reference number in the owner's invoice or quotation sequence."""
+        number = ReferenceSequence.objects.allocate(owner_id, is_quotation)
+        return Invoice.format_reference_number(number, is_quotation)
 
     def save(self, *args, **kwargs):
-        """Override save to set the reference number before saving, and handle is_quotation changes."""
-        
+        """
+        Override save to set the reference number and totals, handle is_quotation changes,
+        and write the row once. Saves limited by update_fields are written as-is.
+        """
+        if kwargs.get('update_fields') is not None:
+            super().save(*args, **kwargs)
+            return
+
         is_quotation_changed = False
         
         if self.pk:
-            old_invoice = Invoice.objects.get(pk=self.pk, client__invoice_owner=self.client.invoice_owner.pk)
-            is_quotation_changed = old_invoice.is_quotation != self.is_quotation
+            loaded_is_quotation = getattr(self, '_loaded_is_quotation', None)
+            if loaded_is_quotation is None:
+                loaded_is_quotation = Invoice.objects.filter(pk=self.pk).values_list('is_quotation', flat=True).first()
+            is_quotation_changed = loaded_is_quotation is not None and loaded_is_quotation != self.is_quotation
 
         if not self.reference_number or is_quotation_changed:
-            if self.is_quotation:
-                last_quotation = Invoice.objects.filter(is_quotation=True, client__invoice_owner=self.client.invoice_owner.pk).order_by('-id').first()
-                self.reference_number = Invoice.get_next_reference_number(last_quotation, is_quotation=True)
-            else:
-                last_invoice = Invoice.objects.filter(is_quotation=False, client__invoice_owner=self.client.invoice_owner.pk).order_by('-id').first()
-                self.reference_number = Invoice.get_next_reference_number(last_invoice, is_quotation=False)
+            self.reference_number = Invoice.get_next_reference_number(self.client.invoice_owner_id, self.is_quotation)
         
-        super().save(*args, **kwargs)
         self.calculate_totals()
         super().save(*args, **kwargs)
+        self._loaded_is_quotation = self.is_quotation
 
     def __str__(self):
         return f"Invoice {self.reference_number}"
@@ -175,6 +235,12 @@ class InvoiceItem(models.Model):
     quantity = models.DecimalField(max_digits=16, decimal_places=3, validators=[MinValueValidator(0)])
     unit_price = models.DecimalField(max_digits=16, decimal_places=3, validators=[MinValueValidator(0)])
     total_price = models.DecimalField(max_digits=16, decimal_places=3, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='invoice_item_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         """Calculate total_price based on quantity and unit_price."""
@@ -182,4 +248,85 @@ class InvoiceItem(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.name} - {self.quantity} x {self.unit_price}"
\ No newline at end of file
+        return f"{self.name} - {self.quantity} x {self.unit_price}"
+
+
+class PDFJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="pdf_jobs")
+    requested_by = models.ForeignKey(InvoiceOwner, on_delete=models.CASCADE, related_name="pdf_jobs")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    fingerprint = models.CharField(max_length=64, blank=True, default='')
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PDFJobManager()
+
+    class Meta:
+        ordering = ('created_at',)
+
+    def __str__(self):
+        return f"PDF job {self.pk} ({self.status})"
+
+
+class Tombstone(models.Model):
+    """A deleted client, invoice or item, kept so /sync can tell clients to drop it."""
+    CLIENT = 'client'
+    INVOICE = 'invoice'
+    INVOICE_ITEM = 'invoice_item'
+    KIND_CHOICES = [
+        (CLIENT, 'Client'),
+        (INVOICE, 'Invoice'),
+        (INVOICE_ITEM, 'Invoice item'),
+    ]
+
+    invoice_owner = models.ForeignKey(InvoiceOwner, on_delete=models.CASCADE, related_name="tombstones", null=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['invoice_owner', 'deleted_at'], name='tombstone_owner_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.kind} {self.object_id}"
+
+
+class SearchTerm(models.Model):
+    """One word of a client's or invoice's searchable text, with how much a match on it counts."""
+    CLIENT = 'client'
+    INVOICE = 'invoice'
+    KIND_CHOICES = [
+        (CLIENT, 'Client'),
+        (INVOICE, 'Invoice'),
+    ]
+
+    invoice_owner = models.ForeignKey(InvoiceOwner, on_delete=models.CASCADE, related_name="search_terms")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['invoice_owner', 'kind', 'term'], name='search_term_owner_idx'),
+            models.Index(fields=['kind', 'term'], name='search_term_idx'),
+            models.Index(fields=['kind', 'object_id'], name='search_term_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} ({self.kind} {self.object_id})"
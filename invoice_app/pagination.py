@@ -0,0 +1,109 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from ninja import Field, Schema
+from ninja.errors import HttpError
+from ninja.pagination import AsyncPaginationBase
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class CursorPagination(AsyncPaginationBase):
+    """
+    Keyset pagination over a fixed ordering, newest first by default.
+
+    Each page is one indexed range query for ``limit + 1`` rows, so deep pages
+    cost the same as the first and nothing is ever counted. Cursors are opaque
+    tokens holding the ordering values of the row a page starts after.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        limit: int = Field(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+
+    class Output(Schema):
+        items: List[Any]
+        next: Optional[str] = None
+        previous: Optional[str] = None
+
+    def __init__(self, ordering=('-updated_at', '-id'), serializer=None, **kwargs):
+        # serializer(page, request, params) turns a page of rows into response items
+        self.ordering = ordering
+        self.serializer = serializer
+        super().__init__(**kwargs)
+
+    def paginate_queryset(self, queryset, pagination: Input, request=None, **params):
+        page_query, fields, backwards = self.page_query(queryset, pagination)
+        return self.build_page(list(page_query), fields, backwards, pagination, request, params)
+
+    async def apaginate_queryset(self, queryset, pagination: Input, request=None, **params):
+        page_query, fields, backwards = self.page_query(queryset, pagination)
+        return self.build_page([row async for row in page_query], fields, backwards, pagination, request, params)
+
+    def page_query(self, queryset, pagination):
+        """The query for one page, with ``limit + 1`` rows to tell whether there is a next one."""
+        fields = [field.lstrip('-') for field in self.ordering]
+        descending = self.ordering[0].startswith('-')
+
+        backwards = False
+        if pagination.cursor:
+            position, backwards = self.decode_cursor(queryset.model, fields, pagination.cursor)
+            # Walking backwards flips the comparison and the sort, then the page is reversed again
+            queryset = queryset.filter(self.after(fields, position, descending != backwards))
+
+        ordering = self.ordering if not backwards else [self.reverse(field) for field in self.ordering]
+        return queryset.order_by(*ordering)[:pagination.limit + 1], fields, backwards
+
+    def build_page(self, page, fields, backwards, pagination, request, params):
+        has_more = len(page) > pagination.limit
+        page = page[:pagination.limit]
+        if backwards:
+            page.reverse()
+
+        next_cursor = previous_cursor = None
+        if page:
+            if has_more or backwards:
+                next_cursor = self.encode_cursor(page[-1], fields, backwards=False)
+            if (has_more and backwards) or (pagination.cursor and not backwards):
+                previous_cursor = self.encode_cursor(page[0], fields, backwards=True)
+
+        if self.serializer is not None:
+            page = self.serializer(page, request, params)
+        return {'items': page, 'next': next_cursor, 'previous': previous_cursor}
+
+    @staticmethod
+    def reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(fields, position, descending):
+        """Rows strictly past ``position`` in the ordering, as (a < x) or (a = x and b < y) ..."""
+        lookup = 'lt' if descending else 'gt'
+        condition = Q()
+        for index, field in enumerate(fields):
+            step = Q(**{f'{field}__{lookup}': position[index]})
+            for previous_field, value in zip(fields[:index], position):
+                step &= Q(**{previous_field: value})
+            condition |= step
+        return condition
+
+    @staticmethod
+    def encode_cursor(obj, fields, backwards):
+        values = [obj[field] if isinstance(obj, dict) else getattr(obj, field) for field in fields]
+        payload = json.dumps([[value.isoformat() if hasattr(value, 'isoformat') else value for value in values], backwards])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(model, fields, cursor):
+        try:
+            values, backwards = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if len(values) != len(fields):
+                raise ValueError
+            position = [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+        except (ValueError, TypeError, ValidationError):
+            raise HttpError(400, "Invalid cursor.")
+        return position, bool(backwards)
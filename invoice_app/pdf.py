@@ -0,0 +1,449 @@
+import hashlib
+import io
+import logging
+import mimetypes
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils._os import safe_join
+from weasyprint import CSS, HTML, default_url_fetcher
+from weasyprint.text.fonts import FontConfiguration
+
+logger = logging.getLogger(__name__)
+
+PDF_TEMPLATE = 'invoice_app/invoice/invoice_pdf.html'
+
+# Applied to every invoice PDF, in order. The template itself carries no styles.
+PDF_STYLESHEETS = (
+    'invoice_app/css/invoice_pdf.css',
+    'invoice_app/css/invoice_pdf_layout.css',
+)
+
+# Bump whenever the template or rendering pipeline changes so cached PDFs are not reused.
+PDF_CACHE_VERSION = 3
+
+# Relative asset URLs in the template resolve against this; the host is never contacted.
+PDF_BASE_URL = 'http://localhost/'
+
+# Per-process cache of asset bytes, keyed on file path and invalidated by mtime/size.
+_asset_cache = {}
+
+
+def _resolve_asset_path(path):
+    """Map a /media/ or /static/ URL path to a file on disk, or None."""
+    try:
+        if path.startswith(settings.MEDIA_URL):
+            return safe_join(settings.MEDIA_ROOT, path[len(settings.MEDIA_URL):])
+        if path.startswith(settings.STATIC_URL):
+            name = path[len(settings.STATIC_URL):]
+            collected = safe_join(settings.STATIC_ROOT, name) if settings.STATIC_ROOT else None
+            if collected and os.path.exists(collected):
+                return collected
+            # Not collected yet (development); look in the app static directories.
+            return finders.find(name)
+    except SuspiciousFileOperation:
+        return None
+    return None
+
+
+def asset_url_fetcher(url, *args, **kwargs):
+    """
+    WeasyPrint URL fetcher that reads media and static files straight from disk
+    and refuses anything else, so rendering a PDF never touches the network.
+    """
+    if url.startswith('data:'):
+        return default_url_fetcher(url, *args, **kwargs)
+
+    parts = urlsplit(url)
+    path = _resolve_asset_path(unquote(parts.path)) if parts.scheme in ('http', 'https', 'file') else None
+    if not path:
+        raise ValueError(f"Refusing to fetch non-local asset: {url}")
+
+    stat = os.stat(path)
+    cached = _asset_cache.get(path)
+    if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+        with open(path, 'rb') as asset:
+            data = asset.read()
+        cached = ((stat.st_mtime_ns, stat.st_size), data, mimetypes.guess_type(path)[0])
+        _asset_cache[path] = cached
+
+    _signature, data, mime_type = cached
+    return {'string': data, 'mime_type': mime_type, 'redirected_url': url}
+
+
+def render_invoice_html(invoice):
+    """
+    Render the PDF template for an invoice to an HTML string. PDFs always use the
+    site language so the same invoice renders identically for every request.
+    """
+    with translation.override(settings.LANGUAGE_CODE):
+        return render_to_string(PDF_TEMPLATE, {'invoice': invoice})
+
+
+_pdf_resources = None
+
+
+def pdf_resources():
+    """
+    Font configuration and parsed stylesheets for invoice PDFs. Built once per
+    process and shared by every render.
+    """
+    global _pdf_resources
+    if _pdf_resources is None:
+        font_config = FontConfiguration()
+        stylesheets = [
+            CSS(
+                filename=_resolve_asset_path(settings.STATIC_URL + name),
+                base_url=PDF_BASE_URL,
+                url_fetcher=asset_url_fetcher,
+                font_config=font_config,
+            )
+            for name in PDF_STYLESHEETS
+        ]
+        _pdf_resources = (font_config, stylesheets)
+    return _pdf_resources
+
+
+def render_html_to_pdf(html_string):
+    """Convert rendered template HTML to PDF bytes with the shared resources."""
+    font_config, stylesheets = pdf_resources()
+    html = HTML(string=html_string, base_url=PDF_BASE_URL, url_fetcher=asset_url_fetcher)
+    return html.write_pdf(stylesheets=stylesheets, font_config=font_config)
+
+
+def render_invoice_pdf(invoice):
+    """Render an invoice straight to PDF bytes, bypassing the cache."""
+    return render_html_to_pdf(render_invoice_html(invoice))
+
+
+def warm_up():
+    """
+    Build the shared PDF resources and lay out a throwaway document so fonts are
+    loaded before the first real invoice is rendered.
+    """
+    try:
+        render_html_to_pdf('<p class="fw-bold">Warm-up</p>')
+    except Exception:
+        logger.warning("PDF warm-up failed; the first render will pay the start-up cost.", exc_info=True)
+
+
+def warm_up_if_enabled():
+    """
+    Warm up when ``PDF_WARM_UP`` is on. Called where a process that renders PDFs
+    starts: the WSGI and ASGI entry points and each render pool worker, so
+    management commands and migrations do not pay for it.
+    """
+    if getattr(settings, 'PDF_WARM_UP', False):
+        warm_up()
+
+
+def _file_signature(field):
+    """Identify an uploaded image by name, size and modification time."""
+    if not field:
+        return None
+    try:
+        stat = os.stat(field.path)
+    except (OSError, ValueError, NotImplementedError):
+        return field.name
+    return f"{field.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def invoice_fingerprint(invoice):
+    """
+    Hash everything the PDF template reads: the invoice, its items, its client,
+    the owner's profile and the owner's logo and signature files.
+    """
+    client = invoice.client
+    owner = client.invoice_owner
+    items = invoice.items.order_by('id').values_list(
+        'id', 'name', 'description', 'unit', 'quantity', 'unit_price', 'total_price'
+    )
+    parts = (
+        PDF_CACHE_VERSION,
+        (
+            invoice.pk, invoice.reference_number, invoice.tax_percentage, invoice.total_price,
+            invoice.tax, invoice.grand_total, invoice.date, invoice.notes, invoice.created_at,
+            invoice.is_taxed, invoice.is_quotation, invoice.transit_charges,
+        ),
+        tuple(items),
+        (client.pk, client.name, client.address, client.ntn_number, client.phone),
+        (
+            owner.pk, owner.name, owner.email, owner.address, owner.phone, owner.phone_2,
+            owner.ntn_number, owner.bank, owner.account_title, owner.iban,
+            _file_signature(owner.logo), _file_signature(owner.signature),
+        ),
+    )
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+class PDFCache:
+    """
+    Content-addressed on-disk cache of rendered PDFs, evicted least-recently-used
+    first once the directory grows past ``PDF_CACHE_MAX_SIZE`` bytes.
+
+    Entries live at ``<PDF_CACHE_ROOT>/<invoice pk>/<fingerprint>.pdf``. Each
+    process keeps a running total of the cache size and only scans the directory
+    when the total passes the limit, or every ``SCAN_EVERY`` writes to take in
+    what other processes stored.
+    """
+    SCAN_EVERY = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = None  # Unknown until the first scan
+        self._writes = 0
+
+    @property
+    def root(self):
+        return Path(getattr(settings, 'PDF_CACHE_ROOT', Path(settings.MEDIA_ROOT) / 'pdf_cache'))
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'PDF_CACHE_MAX_SIZE', 256 * 1024 * 1024)
+
+    def path_for(self, invoice_id, fingerprint):
+        return self.root / str(invoice_id) / f'{fingerprint}.pdf'
+
+    def open(self, invoice_id, fingerprint):
+        """Return an open file for a cached PDF, or None on a miss."""
+        path = self.path_for(invoice_id, fingerprint)
+        try:
+            pdf_file = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        # Touch the entry so eviction sees it as recently used.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return pdf_file
+
+    def put(self, invoice_id, fingerprint, pdf):
+        """
+        Store PDF bytes, replacing any older rendering of the same invoice.
+        Returns the entry's path, or None when the invoice was invalidated while
+        it was being written.
+        """
+        path = self.path_for(invoice_id, fingerprint)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        except FileNotFoundError:
+            return None
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(pdf)
+            os.replace(tmp_path, path)
+        except FileNotFoundError:
+            # invalidate_invoice() removed the directory underneath us; the rendering is stale anyway
+            return None
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        removed = 0
+        for older in path.parent.glob('*.pdf'):
+            if older != path:
+                removed += self._unlink(older)
+        self._stored(len(pdf) - removed)
+        return path
+
+    def invalidate_invoice(self, invoice_id):
+        shutil.rmtree(self.root / str(invoice_id), ignore_errors=True)
+
+    def _unlink(self, path):
+        """Delete an entry if it is still there and return the bytes freed."""
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        return size
+
+    def _stored(self, size):
+        with self._lock:
+            self._writes += 1
+            if self._size is not None and self._writes < self.SCAN_EVERY and self._size + size <= self.max_size:
+                self._size += size
+                return
+            self._writes = 0
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in ``max_size``."""
+        entries = []
+        total = 0
+        for path in self.root.glob('*/*.pdf'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total > self.max_size:
+            entries.sort()
+            for _mtime, _size, path in entries:
+                if total <= self.max_size:
+                    break
+                total -= self._unlink(path)
+
+        with self._lock:
+            self._size = total
+
+
+pdf_cache = PDFCache()
+
+
+def open_invoice_pdf(invoice):
+    """
+    Return a readable file object with the invoice PDF, rendering and caching
+    it only when no PDF exists for the invoice's current fingerprint.
+    """
+    fingerprint = invoice_fingerprint(invoice)
+    pdf_file = pdf_cache.open(invoice.pk, fingerprint)
+    if pdf_file is not None:
+        return pdf_file
+
+    pdf = render_invoice_pdf(invoice)
+    pdf_cache.put(invoice.pk, fingerprint, pdf)
+    return io.BytesIO(pdf)
+
+
+def _init_render_worker():
+    import django
+    django.setup()
+    warm_up_if_enabled()
+
+
+def get_render_pool(max_workers=None):
+    """
+    Process pool for rendering PDFs off the request path. Workers are spawned
+    rather than forked so they never share the parent's database connections.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_render_worker,
+    )
+
+
+def render_invoice_to_cache(invoice_id):
+    """
+    Make sure the PDF cache holds the current rendering of an invoice and return
+    its fingerprint. Meant to run inside a render pool worker.
+    """
+    from .models import Invoice
+
+    invoice = Invoice.objects.select_related('client__invoice_owner').get(pk=invoice_id)
+    fingerprint = invoice_fingerprint(invoice)
+    if not pdf_cache.path_for(invoice.pk, fingerprint).exists():
+        pdf_cache.put(invoice.pk, fingerprint, render_invoice_pdf(invoice))
+    return fingerprint
+
+
+_shared_pool = None
+
+
+def render_processes():
+    """Size of each web process's shared render pool; every web worker process starts its own."""
+    return max(getattr(settings, 'PDF_RENDER_PROCESSES', 2), 1)
+
+
+def shared_render_pool():
+    """Render pool kept alive for the lifetime of a web process."""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = get_render_pool(render_processes())
+    return _shared_pool
+
+
+class _ZipStream:
+    """Write-only sink that lets ZipFile feed a streaming response."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_invoice_pdfs_zip(invoices):
+    """
+    Yield a ZIP archive of invoice PDFs chunk by chunk. Cache misses are rendered
+    in parallel on the render pool and each PDF is added as soon as it is ready,
+    so neither the archive nor the full invoice list is held in memory.
+    """
+    pool = shared_render_pool()
+    window = 2 * render_processes()
+    invoices = iter(invoices)
+    pending = {}
+    names = set()
+    errors = []
+
+    def fill():
+        while len(pending) < window:
+            invoice = next(invoices, None)
+            if invoice is None:
+                return
+            pending[pool.submit(render_invoice_to_cache, invoice.pk)] = invoice
+
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                invoice = pending.pop(future)
+                try:
+                    # The entry may have been evicted already; render in-process if so.
+                    pdf_file = pdf_cache.open(invoice.pk, future.result()) or io.BytesIO(render_invoice_pdf(invoice))
+                except Exception as e:
+                    errors.append(f"{invoice.reference_number}: {e}")
+                    continue
+
+                name = f"{invoice.reference_number}.pdf"
+                if name in names:
+                    name = f"{invoice.reference_number}-{invoice.pk}.pdf"
+                names.add(name)
+
+                with pdf_file, archive.open(name, 'w') as entry:
+                    shutil.copyfileobj(pdf_file, entry)
+                yield stream.drain()
+            fill()
+
+        if errors:
+            archive.writestr('errors.txt', "\n".join(errors) + "\n")
+    yield stream.drain()
+
+
+async def aiter_file(pdf_file, chunk_size=64 * 1024):
+    """Yield an open file's contents for an async response, reading each chunk in a worker thread."""
+    read = sync_to_async(pdf_file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(chunk_size):
+            yield chunk
+    finally:
+        pdf_file.close()
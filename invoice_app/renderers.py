@@ -0,0 +1,166 @@
+import datetime
+import decimal
+import inspect
+from functools import wraps
+
+import orjson
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBase
+from django.utils.cache import patch_vary_headers
+from ninja import NinjaAPI
+from ninja.renderers import BaseRenderer
+import msgpack
+from pydantic import BaseModel
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MSGPACK_ALIASES = (MSGPACK, 'application/x-msgpack')
+
+# orjson writes datetimes itself; OPT_UTC_Z keeps the trailing "Z" clients already parse
+JSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    # Same wire format as Ninja's DjangoJSONEncoder for Decimals
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def _msgpack_default(obj):
+    # msgpack has no date types clients agree on; send the same strings as the JSON body
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return orjson.dumps(obj, option=JSON_OPTIONS)[1:-1].decode()
+    return _default(obj)
+
+
+def dumps(data):
+    """Encode ``data`` exactly as the API's JSON bodies are encoded."""
+    return orjson.dumps(data, default=_default, option=JSON_OPTIONS)
+
+
+def with_response_arg(wrapper, func):
+    """Ask Ninja for its temporal response so ``wrapper`` can set headers on it."""
+    signature = inspect.signature(func)
+    response = inspect.Parameter('response', inspect.Parameter.KEYWORD_ONLY, annotation=HttpResponse)
+    wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), response])
+    return wrapper
+
+
+def _quality(accepted_types, media_type):
+    """
+    ``(q, specificity)`` of the most specific Accept range matching
+    ``media_type``: 2 for the type itself, 1 for ``type/*``, 0 for ``*/*``, and
+    ``(0, -1)`` when none matches. A range with a malformed q counts as q=0.
+    """
+    main_type, sub_type = media_type.split('/')
+    best = (0, -1)
+    for accepted in accepted_types:
+        if (accepted.main_type, accepted.sub_type) == (main_type, sub_type):
+            specificity = 2
+        elif (accepted.main_type, accepted.sub_type) == (main_type, '*'):
+            specificity = 1
+        elif accepted.is_all_types:
+            specificity = 0
+        else:
+            continue
+        if specificity > best[1]:
+            try:
+                q = float(accepted.params.get('q', 1))
+            except ValueError:
+                q = 0
+            best = (q if 0 <= q <= 1 else 0, specificity)
+    return best
+
+
+def preferred_media_type(request):
+    """
+    msgpack when the client's Accept header ranks it above JSON, or names it
+    outright at the same q; JSON otherwise, including when it accepts neither.
+    """
+    json_q, _specificity = _quality(request.accepted_types, JSON)
+    msgpack_q, specificity = max(_quality(request.accepted_types, alias) for alias in MSGPACK_ALIASES)
+    if msgpack_q > json_q or (msgpack_q == json_q > 0 and specificity == 2):
+        return MSGPACK
+    return JSON
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = JSON
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
+
+
+class MsgPackRenderer(BaseRenderer):
+    media_type = MSGPACK
+    charset = None
+
+    def render(self, request, data, *, response_status):
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+class NegotiatingRenderer(BaseRenderer):
+    """Picks a renderer per request from the Accept header."""
+    media_type = JSON
+
+    def __init__(self):
+        self.renderers = {JSON: ORJSONRenderer(), MSGPACK: MsgPackRenderer()}
+
+    def for_request(self, request):
+        return self.renderers[preferred_media_type(request)]
+
+    def render(self, request, data, *, response_status):
+        return self.for_request(request).render(request, data, response_status=response_status)
+
+    def content_type(self, request):
+        renderer = self.for_request(request)
+        if renderer.charset:
+            return f"{renderer.media_type}; charset={renderer.charset}"
+        return renderer.media_type
+
+
+class NegotiatingNinjaAPI(NinjaAPI):
+    """NinjaAPI whose responses carry the content type of the renderer chosen for each request."""
+
+    def create_response(self, request, data, *, status=None, temporal_response=None):
+        response = super().create_response(request, data, status=status, temporal_response=temporal_response)
+        response['Content-Type'] = self.renderer.content_type(request)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def create_temporal_response(self, request):
+        return HttpResponse("", content_type=self.renderer.content_type(request))
+
+    def trusted_response(self, func):
+        """
+        Render what a GET endpoint returns straight to the response, skipping
+        Ninja's validation against the response schema. Only for views whose
+        body is built by a fieldset, which already has the schema's shape and
+        types. ``(status, body)`` tuples, e.g. errors, are still validated.
+
+        Goes directly under the ``@api.get`` decorator, above ``etag_response``.
+        """
+        forwards_response = 'response' in inspect.signature(func).parameters
+
+        def render(request, response, result):
+            if not settings.API_TRUSTED_RESPONSES or isinstance(result, (tuple, HttpResponseBase)):
+                return result
+            return self.create_response(request, result, temporal_response=response)
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(request, response, **kwargs):
+                if forwards_response:
+                    kwargs['response'] = response
+                return render(request, response, await func(request, **kwargs))
+        else:
+            @wraps(func)
+            def wrapper(request, response, **kwargs):
+                if forwards_response:
+                    kwargs['response'] = response
+                return render(request, response, func(request, **kwargs))
+
+        return wrapper if forwards_response else with_response_arg(wrapper, func)
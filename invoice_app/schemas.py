@@ -1,6 +1,6 @@
 from ninja import Schema
-from datetime import datetime
-from typing import List, Optional, Union
+from datetime import date, datetime
+from typing import Any, List, Optional, Union
 
 # ---------- Success Schema ----------
 class SuccessSchema(Schema):
@@ -66,15 +66,22 @@ class ClientUpdate(Schema):
     ntn_number: Optional[str] = None
     phone: Optional[str] = None
 
+# Client, invoice and item output keeps every field but id optional: fields= picks
+# the columns and expand= swaps a foreign key id for the nested object.
 class ClientOut(Schema):
     id: int
-    name: str
-    invoice_owner: InvoiceOwnerOut
+    invoice_owner_id: Optional[int] = None
+    invoice_owner: Optional[InvoiceOwnerOut] = None
+    name: Optional[str] = None
     address: Optional[str] = None
     ntn_number: Optional[str] = None
     phone: Optional[str] = None
-    created_at: datetime
-    updated_at: datetime
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class ClientSuggestionOut(Schema):
+    id: int
+    name: str
 
 # ---------- Invoice Schemas ----------
 class InvoiceCreate(Schema):
@@ -96,22 +103,31 @@ class InvoiceUpdate(Schema):
     is_quotation: Optional[bool] = None
     transit_charges: Optional[float] = None
 
+class InvoiceFilter(Schema):
+    owner_id: Optional[int] = None
+    client_id: Optional[int] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    is_quotation: Optional[bool] = None
+    is_paid: Optional[bool] = None
+
 class InvoiceOut(Schema):
     id: int
-    client: ClientOut
-    reference_number: str
+    client_id: Optional[int] = None
+    client: Optional[ClientOut] = None
+    reference_number: Optional[str] = None
     tax_percentage: Optional[float] = None
-    total_price: float
-    tax: float
-    grand_total: float
+    total_price: Optional[float] = None
+    tax: Optional[float] = None
+    grand_total: Optional[float] = None
     date: Optional[str] = None
     notes: Optional[str] = None
-    is_taxed: bool
-    is_paid: bool
-    is_quotation: bool
+    is_taxed: Optional[bool] = None
+    is_paid: Optional[bool] = None
+    is_quotation: Optional[bool] = None
     transit_charges: Optional[float] = None
-    created_at: datetime
-    updated_at: datetime
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 # ---------- InvoiceItem Schemas ----------
 class InvoiceItemCreate(Schema):
@@ -128,15 +144,91 @@ class InvoiceItemUpdate(Schema):
     quantity: Optional[float] = None
     unit_price: Optional[float] = None
 
+class InvoiceItemBatchUpdate(InvoiceItemUpdate):
+    id: int
+
 class InvoiceItemOut(Schema):
     id: int
-    invoice_id: int
-    name: str
-    unit: str
+    invoice_id: Optional[int] = None
+    invoice: Optional[InvoiceOut] = None
+    name: Optional[str] = None
+    unit: Optional[str] = None
     description: Optional[str] = None
-    quantity: float
-    unit_price: float
-    total_price: float
+    quantity: Optional[float] = None
+    unit_price: Optional[float] = None
+    total_price: Optional[float] = None
+    updated_at: Optional[datetime] = None
+
+# ---------- Sync Schemas ----------
+class SyncDeletedOut(Schema):
+    clients: List[int]
+    invoices: List[int]
+    items: List[int]
+
+class SyncOut(Schema):
+    clients: List[ClientOut]
+    invoices: List[InvoiceOut]
+    items: List[InvoiceItemOut]
+    deleted: SyncDeletedOut
+    cursor: str
+    next: Optional[str] = None
+
+# ---------- Search Schemas ----------
+class ClientSearchOut(ClientOut):
+    rank: int
+
+class InvoiceSearchOut(InvoiceOut):
+    rank: int
+
+class SearchOut(Schema):
+    clients: List[ClientSearchOut]
+    invoices: List[InvoiceSearchOut]
+
+# ---------- Batch Schemas ----------
+class BatchRequestIn(Schema):
+    path: str
+
+class BatchIn(Schema):
+    requests: List[BatchRequestIn]
+
+class BatchResponseOut(Schema):
+    path: str
+    status: int
+    body: Any = None
+
+class BatchOut(Schema):
+    responses: List[BatchResponseOut]
+
+# ---------- Import Schemas ----------
+class InvoiceImportRow(Schema):
+    client_id: Optional[int] = None
+    client_name: Optional[str] = None
+    tax_percentage: Optional[float] = None
+    date: Optional[str] = None
+    notes: Optional[str] = None
+    is_taxed: Optional[bool] = None
+    is_paid: Optional[bool] = None
+    is_quotation: Optional[bool] = None
+    transit_charges: Optional[float] = None
+    items: List[InvoiceItemCreate] = []
+
+class ImportErrorOut(Schema):
+    row: int
+    detail: List[str]
+
+class ImportReportOut(Schema):
+    created: int
+    failed: int
+    errors: List[ImportErrorOut]
+
+# ---------- PDF Job Schemas ----------
+class PDFJobOut(Schema):
+    id: int
+    invoice_id: int
+    status: str
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
 
 # --------- Password Reset Schemas ---------
 class ForgotPasswordRequestSchema(Schema):
@@ -0,0 +1,146 @@
+import re
+import threading
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Prefetch, Q, Sum, Value, When
+from .fieldsets import client_fieldset, invoice_fieldset
+from .models import Client, Invoice, InvoiceItem, SearchTerm
+
+# Words longer than a term are cut to its length, in the index and in queries alike
+TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+MAX_QUERY_WORDS = 8
+
+_WORD = re.compile(r'\w+')
+_pending = threading.local()
+
+
+def tokenize(text):
+    return [word[:TERM_LENGTH] for word in _WORD.findall(text.lower())] if text else []
+
+
+def _client_documents(ids):
+    for client in Client.objects.filter(id__in=ids):
+        yield client.id, client.invoice_owner_id, [
+            (client.name, 4), (client.ntn_number, 2), (client.phone, 2), (client.address, 1),
+        ]
+
+
+def _invoice_documents(ids):
+    items = Prefetch('items', queryset=InvoiceItem.objects.only('invoice_id', 'name', 'description'))
+    for invoice in Invoice.objects.filter(id__in=ids).select_related('client').prefetch_related(items):
+        # The number on its own too, so "12" finds I_SAE-0012
+        number = str(Invoice.parse_reference_number(invoice.reference_number))
+        fields = [(invoice.reference_number, 8), (number, 8), (invoice.client.name, 4), (invoice.notes, 1)]
+        for item in invoice.items.all():
+            fields += [(item.name, 2), (item.description, 1)]
+        yield invoice.id, invoice.client.invoice_owner_id, fields
+
+
+DOCUMENTS = {
+    SearchTerm.CLIENT: _client_documents,
+    SearchTerm.INVOICE: _invoice_documents,
+}
+
+
+def reindex(kind, ids):
+    """Rebuild the search terms of the given clients or invoices. Ids that no longer exist lose theirs."""
+    ids = list(ids)
+    terms = []
+    for object_id, owner_id, fields in DOCUMENTS[kind](ids):
+        weights = {}
+        for text, weight in fields:
+            for term in tokenize(text):
+                weights[term] = max(weight, weights.get(term, 0))
+        terms += [
+            SearchTerm(invoice_owner_id=owner_id, kind=kind, object_id=object_id, term=term, weight=weight)
+            for term, weight in weights.items()
+        ]
+    with transaction.atomic():
+        SearchTerm.objects.filter(kind=kind, object_id__in=ids).delete()
+        SearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+def schedule_reindex(kind, *ids):
+    """
+    Reindex clients or invoices once the current transaction commits. Saving an
+    invoice and its items touches it many times; it is reindexed once, as committed.
+    """
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = set()
+    _pending.ids.update((kind, object_id) for object_id in ids)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    # The first callback of a transaction reindexes everything scheduled so far; the rest find nothing to do.
+    # Ids left over from a rolled back transaction are picked up here too, which only repeats work.
+    pending, _pending.ids = getattr(_pending, 'ids', set()), set()
+    by_kind = {}
+    for kind, object_id in pending:
+        by_kind.setdefault(kind, []).append(object_id)
+    for kind, ids in by_kind.items():
+        reindex(kind, ids)
+
+
+def matches(user, kind, text):
+    """
+    The user's clients or invoices whose text has every word of ``text`` as a
+    word or word prefix, as rows of ``object_id`` and ``rank``, or None when
+    ``text`` has no words. A term counts its weight, twice over when the word
+    matches it whole.
+    """
+    words = list(dict.fromkeys(tokenize(text)))[:MAX_QUERY_WORDS]
+    if not words:
+        return None
+
+    terms = SearchTerm.objects.filter(kind=kind)
+    if not user.is_staff:
+        terms = terms.filter(invoice_owner=user)
+    any_word = Q()
+    for word in words:
+        any_word |= Q(term__startswith=word)
+    # One flag per word, so only documents matching all of them are kept
+    matched = {
+        f'word{index}': Max(Case(When(term__startswith=word, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for index, word in enumerate(words)
+    }
+    rank = Sum(Case(When(term__in=words, then=F('weight') * 2), default=F('weight'), output_field=IntegerField()))
+    return terms.filter(any_word).values('object_id').annotate(rank=rank, **matched).filter(**{name: 1 for name in matched})
+
+
+def search(user, kind, text, limit=None):
+    """``(id, rank)`` of the user's clients or invoices matching ``text``, best match first."""
+    rows = matches(user, kind, text)
+    if rows is None:
+        return []
+    rows = rows.order_by('-rank', '-object_id')
+    if limit is not None:
+        rows = rows[:limit]
+    return [(row['object_id'], row['rank']) for row in rows]
+
+
+def matching_ids(user, kind, text):
+    """The ids of :func:`search`'s matches as a subquery, for filtering without reading them first."""
+    rows = matches(user, kind, text)
+    if rows is None:
+        return SearchTerm.objects.none().values('object_id')
+    return rows.values('object_id')
+
+
+def _ranked(selection, queryset, hits):
+    rows = {row['id']: row for row in selection.values(queryset.filter(id__in=[object_id for object_id, _rank in hits]))}
+    memo = {}
+    return [
+        {**selection.build(rows[object_id], memo=memo), 'rank': rank}
+        for object_id, rank in hits if object_id in rows
+    ]
+
+
+def search_results(user, text, limit, expand=None):
+    """The best ``limit`` client and invoice matches for ``text``, serialized with their rank."""
+    return {
+        'clients': _ranked(client_fieldset.select(), Client.objects.all(), search(user, SearchTerm.CLIENT, text, limit)),
+        'invoices': _ranked(
+            invoice_fieldset.select(expand=expand), Invoice.objects.all(), search(user, SearchTerm.INVOICE, text, limit),
+        ),
+    }
@@ -0,0 +1,185 @@
+import datetime
+import re
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db.models import Q
+from .models import Invoice, SearchTerm
+from .search import matching_ids
+
+MONTHS = ('january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october', 'november', 'december')
+_MONTH = '|'.join(name[:3] + '[a-z]*' for name in MONTHS)
+
+# Every kind of term in one pattern; the first alternative that matches a whole token wins
+TOKEN = re.compile(rf'''
+    (?P<qualifier>[a-z]+):(?:"(?P<quoted_value>[^"]*)"|(?P<value>\S+))
+  | "(?P<phrase>[^"]*)"
+  | (?P<iso_year>\d{{4}})-(?P<iso_month>\d{{1,2}})-(?P<iso_day>\d{{1,2}})(?!\S)
+  | (?P<day>\d{{1,2}})[-/\ ](?:(?P<month>\d{{1,2}})|(?P<month_name>{_MONTH}))(?:[-/\ ](?P<year>\d{{4}}|\d{{2}}))?(?!\S)
+  | (?P<reference>[iq]_sae-(?P<reference_number>\d+))(?!\S)
+  | (?P<amount>\d{{1,3}}(?:,\d{{3}})+(?:\.\d+)?|\d+\.\d+)(?!\S)
+  | (?P<word>\S+)
+''', re.IGNORECASE | re.VERBOSE)
+
+TRUE_VALUES = {'yes', 'y', 'true', '1'}
+FALSE_VALUES = {'no', 'n', 'false', '0'}
+
+Term = namedtuple('Term', 'field value')
+
+
+def parse_bool(value):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+
+def parse_month(name):
+    name = name.lower()
+    for number, month in enumerate(MONTHS, start=1):
+        if month.startswith(name) and len(name) >= 3:
+            return number
+    raise ValueError(name)
+
+
+def make_date(year, month, day):
+    if year is None:
+        year = datetime.date.today().year
+    elif year < 100:
+        # As strptime's %y: 69-99 are 1900s, the rest 2000s
+        year += 1900 if year >= 69 else 2000
+    return datetime.date(year, month, day)
+
+
+def parse_reference(value):
+    match = TOKEN.fullmatch(value)
+    if match is None or match['reference'] is None:
+        raise ValueError(value)
+    return Invoice.format_reference_number(int(match['reference_number']), match['reference'][0] in 'qQ')
+
+
+def parse_date(value):
+    match = TOKEN.fullmatch(value)
+    if match is None or not (match['iso_year'] or match['day']):
+        raise ValueError(value)
+    return _date(match)
+
+
+def _date(match):
+    if match['iso_year']:
+        return make_date(int(match['iso_year']), int(match['iso_month']), int(match['iso_day']))
+    month = int(match['month']) if match['month'] else parse_month(match['month_name'])
+    return make_date(int(match['year']) if match['year'] else None, month, int(match['day']))
+
+
+class QueryParser:
+    """
+    Turns the search box input into one ``Q``. Terms are ANDed. Dates, amounts
+    and reference numbers are matched against their columns, ``field:value``
+    qualifiers against theirs, and the remaining words all go to the search
+    index in a single lookup. A term that does not parse as what it looks like
+    is searched for as text.
+    """
+    kind = None
+    date_fields = ('created_at__date', 'updated_at__date')
+    day_fields = ('created_at__day', 'updated_at__day')
+    amount_fields = ()
+    reference_field = None
+    # qualifier -> (value parser, lookup); a ValueError from the parser makes the term text
+    qualifiers = {}
+
+    def parse(self, text):
+        """Split ``text`` into Terms without touching the database."""
+        text = text.strip()
+        if text.isdigit() and 1 <= int(text) <= 31:
+            # A bare day number on its own, as in "15"
+            return [Term('day', int(text))]
+
+        terms = []
+        for match in TOKEN.finditer(text):
+            try:
+                terms.append(self.term(match))
+            except ValueError:
+                terms.append(Term('text', match[0]))
+        return terms
+
+    def term(self, match):
+        if match['qualifier']:
+            name = match['qualifier'].lower()
+            if name not in self.qualifiers:
+                raise ValueError(name)
+            value = match['value'] if match['quoted_value'] is None else match['quoted_value']
+            return Term(name, self.qualifiers[name][0](value))
+        if match['phrase'] is not None:
+            return Term('text', match['phrase'])
+        if match['iso_year'] or match['day']:
+            return Term('date', _date(match))
+        if match['reference'] and self.reference_field:
+            return Term('reference', parse_reference(match['reference']))
+        if match['amount'] and self.amount_fields:
+            return Term('amount', Decimal(match['amount'].replace(',', '')))
+        return Term('text', match[0])
+
+    def any_of(self, fields, value):
+        query = Q()
+        for field in fields:
+            query |= Q(**{field: value})
+        return query
+
+    def build(self, user, text):
+        """The ``Q`` for ``text``; words are looked up in the search index as ``user``."""
+        query = Q()
+        words = []
+        for term in self.parse(text):
+            if term.field == 'text':
+                words.append(term.value)
+            elif term.field == 'day':
+                query &= self.any_of(self.day_fields, term.value)
+            elif term.field == 'date':
+                query &= self.any_of(self.date_fields, term.value)
+            elif term.field == 'amount':
+                query &= self.any_of(self.amount_fields, term.value)
+            elif term.field == 'reference':
+                query &= Q(**{self.reference_field: term.value})
+            else:
+                query &= self.qualifier_query(user, term)
+        if words:
+            query &= Q(pk__in=matching_ids(user, self.kind, ' '.join(words)))
+        return query
+
+    def qualifier_query(self, user, term):
+        return Q(**{self.qualifiers[term.field][1]: term.value})
+
+
+class InvoiceQueryParser(QueryParser):
+    kind = SearchTerm.INVOICE
+    date_fields = ('date', 'created_at__date', 'updated_at__date')
+    amount_fields = ('grand_total', 'total_price')
+    reference_field = 'reference_number'
+    qualifiers = {
+        'client': (str, None),  # Matched through the clients' search index
+        'paid': (parse_bool, 'is_paid'),
+        'quotation': (parse_bool, 'is_quotation'),
+        'taxed': (parse_bool, 'is_taxed'),
+        'ref': (parse_reference, 'reference_number'),
+        'date': (parse_date, 'date'),
+    }
+
+    def qualifier_query(self, user, term):
+        if term.field == 'client':
+            return Q(client_id__in=matching_ids(user, SearchTerm.CLIENT, term.value))
+        return super().qualifier_query(user, term)
+
+
+class ClientQueryParser(QueryParser):
+    kind = SearchTerm.CLIENT
+    qualifiers = {
+        'ntn': (str, 'ntn_number__startswith'),
+        'phone': (str, 'phone__contains'),
+    }
+
+
+invoice_query_parser = InvoiceQueryParser()
+client_query_parser = ClientQueryParser()
@@ -0,0 +1,104 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import bump_owner
+from .models import InvoiceOwner, Client, Invoice, InvoiceItem, SearchTerm, Tombstone
+from .pdf import pdf_cache
+from .search import schedule_reindex
+from .suggest import remove_client_name, update_client_name
+from .sync import stamp_on_commit
+
+
+def invalidate_invoice_pdfs(invoices):
+    for invoice_id in invoices.values_list('id', flat=True):
+        pdf_cache.invalidate_invoice(invoice_id)
+
+
+def invoice_owner_id(invoice):
+    """Owner of an invoice without loading the client when it is not already cached."""
+    if Invoice.client.is_cached(invoice):
+        return invoice.client.invoice_owner_id
+    return Client.objects.filter(pk=invoice.client_id).values_list('invoice_owner_id', flat=True).first()
+
+
+def deleted_by_cascade(instance, origin):
+    """Whether ``instance`` was deleted along with a parent rather than on its own."""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is not type(instance)
+
+
+def record_tombstone(kind, instance, owner_id, origin):
+    """
+    Remember a deleted row for /sync. Rows removed by a cascade are skipped, as
+    the parent's tombstone already tells clients to drop them.
+    """
+    if not deleted_by_cascade(instance, origin):
+        tombstone = Tombstone.objects.create(kind=kind, object_id=instance.pk, invoice_owner_id=owner_id)
+        stamp_on_commit(Tombstone, tombstone.pk)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invoice_changed(sender, instance, signal, **kwargs):
+    pdf_cache.invalidate_invoice(instance.pk)
+    schedule_reindex(SearchTerm.INVOICE, instance.pk)
+    owner_id = invoice_owner_id(instance)
+    if signal is post_delete:
+        record_tombstone(Tombstone.INVOICE, instance, owner_id, kwargs['origin'])
+    else:
+        stamp_on_commit(Invoice, instance.pk)
+    bump_owner(owner_id)
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def invoice_item_changed(sender, instance, signal, **kwargs):
+    if signal is post_delete and deleted_by_cascade(instance, kwargs['origin']):
+        # The invoice is going too; its own signal invalidates, reindexes and bumps once for all its items
+        return
+    pdf_cache.invalidate_invoice(instance.invoice_id)
+    schedule_reindex(SearchTerm.INVOICE, instance.invoice_id)
+    if InvoiceItem.invoice.is_cached(instance):
+        owner_id = invoice_owner_id(instance.invoice)
+    else:
+        owner_id = Invoice.objects.filter(pk=instance.invoice_id).values_list('client__invoice_owner_id', flat=True).first()
+    if signal is post_delete:
+        record_tombstone(Tombstone.INVOICE_ITEM, instance, owner_id, kwargs['origin'])
+    else:
+        stamp_on_commit(InvoiceItem, instance.pk)
+    bump_owner(owner_id)
+
+
+@receiver(post_save, sender=Client)
+def client_changed(sender, instance, **kwargs):
+    invoice_ids = list(Invoice.objects.filter(client=instance).values_list('id', flat=True))
+    for invoice_id in invoice_ids:
+        pdf_cache.invalidate_invoice(invoice_id)
+    # The client's name is part of its invoices' search text
+    schedule_reindex(SearchTerm.CLIENT, instance.pk)
+    schedule_reindex(SearchTerm.INVOICE, *invoice_ids)
+    update_client_name(instance)
+    stamp_on_commit(Client, instance.pk)
+    bump_owner(instance.invoice_owner_id)
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, origin=None, **kwargs):
+    schedule_reindex(SearchTerm.CLIENT, instance.pk)
+    remove_client_name(instance)
+    record_tombstone(Tombstone.CLIENT, instance, instance.invoice_owner_id, origin)
+    bump_owner(instance.invoice_owner_id)
+
+
+@receiver(post_save, sender=InvoiceOwner)
+def invoice_owner_changed(sender, instance, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which never appears on a PDF or in an API response.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_invoice_pdfs(Invoice.objects.filter(client__invoice_owner=instance))
+    bump_owner(instance.pk)
+
+
+@receiver(post_delete, sender=InvoiceOwner)
+def invoice_owner_deleted(sender, instance, **kwargs):
+    bump_owner(instance.pk)
@@ -0,0 +1,96 @@
+// Turns a <select data-suggest-url> into a search box. Choices are fetched from
+// the suggest endpoint as the user types; the select keeps only the chosen one.
+(function () {
+  const DELAY = 150; // Milliseconds to wait for typing to pause
+
+  function setUp(select) {
+    const wrapper = document.createElement("div");
+    wrapper.className = "dropdown suggest-select";
+    const input = document.createElement("input");
+    input.type = "search";
+    input.className = "form-control";
+    input.autocomplete = "off";
+    input.placeholder = select.options[0] ? select.options[0].text : "";
+    input.autofocus = select.autofocus;
+    const menu = document.createElement("ul");
+    menu.className = "dropdown-menu w-100";
+
+    const chosen = select.options[select.selectedIndex];
+    if (chosen && chosen.value) {
+      input.value = chosen.text;
+    }
+
+    select.hidden = true;
+    select.autofocus = false;
+    select.parentNode.insertBefore(wrapper, select);
+    wrapper.appendChild(input);
+    wrapper.appendChild(menu);
+    wrapper.appendChild(select);
+
+    let timer = null;
+    let controller = null;
+
+    function choose(id, name) {
+      select.querySelectorAll("option[value]:not([value=''])").forEach((option) => option.remove());
+      select.appendChild(new Option(name, id, true, true));
+      select.dispatchEvent(new Event("change", { bubbles: true }));
+      input.value = name;
+      menu.classList.remove("show");
+    }
+
+    function render(suggestions) {
+      menu.replaceChildren();
+      suggestions.forEach(({ id, name }) => {
+        const link = document.createElement("a");
+        link.href = "#";
+        link.className = "dropdown-item";
+        link.textContent = name;
+        link.addEventListener("mousedown", (event) => {
+          event.preventDefault(); // Keep focus so blur does not close the menu first
+          choose(id, name);
+        });
+        const item = document.createElement("li");
+        item.appendChild(link);
+        menu.appendChild(item);
+      });
+      menu.classList.toggle("show", suggestions.length > 0);
+    }
+
+    async function fetchSuggestions() {
+      if (controller) controller.abort();
+      controller = new AbortController();
+      const url = new URL(select.dataset.suggestUrl, window.location.origin);
+      url.searchParams.set("q", input.value);
+      try {
+        const res = await fetch(url, { credentials: "same-origin", signal: controller.signal });
+        if (res.ok) render(await res.json());
+      } catch (error) {
+        if (error.name !== "AbortError") console.error("Error fetching suggestions:", error);
+      }
+    }
+
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      if (!input.value.trim()) {
+        select.value = "";
+        render([]);
+        return;
+      }
+      timer = setTimeout(fetchSuggestions, DELAY);
+    });
+    input.addEventListener("keydown", (event) => {
+      const first = menu.querySelector(".dropdown-item");
+      if (event.key === "Enter" && first && menu.classList.contains("show")) {
+        event.preventDefault();
+        first.dispatchEvent(new MouseEvent("mousedown"));
+      } else if (event.key === "Escape") {
+        menu.classList.remove("show");
+      }
+    });
+    input.addEventListener("blur", () => menu.classList.remove("show"));
+  }
+
+  document.addEventListener("DOMContentLoaded", () => {
+    document.querySelectorAll("select[data-suggest-url]").forEach(setUp);
+  });
+})();
@@ -0,0 +1,162 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Client
+from .search import tokenize
+
+ALL_CLIENTS = 'all'
+MAX_INDEXES = 256
+MAX_SUGGESTIONS = 50
+LAST_CHARACTER = chr(0x10FFFF)
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def version_key(scope):
+    return f'suggest:clients:{scope}'
+
+
+class ClientNameIndex:
+    """
+    The names of one owner's clients, or of every client for staff, as a sorted
+    list of ``(word, id)`` pairs. The ids with a word starting with a prefix
+    are one slice of it, found with two binary searches.
+    """
+
+    def __init__(self, version, clients):
+        self.version = version
+        self.built = time.monotonic()
+        self.names = {}
+        pairs = []
+        for client_id, name in clients:
+            words = self.entry(client_id, name)
+            pairs += [(word, client_id) for word in words]
+        self.words = sorted(pairs)
+
+    def entry(self, client_id, name):
+        """Store a name with its words joined behind spaces, so " word" finds a word start; returns its words."""
+        words = tokenize(name)
+        self.names[client_id] = (name, ' ' + ' '.join(words), name.lower())
+        return set(words)
+
+    def add(self, client_id, name):
+        self.remove(client_id)
+        for word in self.entry(client_id, name):
+            insort(self.words, (word, client_id))
+
+    def remove(self, client_id):
+        if client_id not in self.names:
+            return
+        for word in set(self.names.pop(client_id)[1].split()):
+            index = bisect_left(self.words, (word, client_id))
+            if index < len(self.words) and self.words[index] == (word, client_id):
+                del self.words[index]
+
+    def prefix_range(self, prefix):
+        return bisect_left(self.words, (prefix,)), bisect_left(self.words, (prefix + LAST_CHARACTER,))
+
+    def suggest(self, text, limit):
+        """Up to ``limit`` ``(id, name)`` pairs whose name has a word starting with each word of ``text``."""
+        query = tokenize(text)
+        if not query:
+            return []
+        # Read the ids of the word with the fewest matches, then check the other words on those names
+        start, stop = min((self.prefix_range(part) for part in set(query)), key=lambda bounds: bounds[1] - bounds[0])
+        ids = {client_id for _word, client_id in self.words[start:stop]}
+
+        text = ' ' + ' '.join(query)
+        starts = [' ' + part for part in query]
+        matches = []
+        for client_id in ids:
+            name, spaced, lowered = self.names[client_id]
+            if all(start in spaced for start in starts):
+                # Names that start with the query first, then shorter names
+                matches.append((not spaced.startswith(text), len(name), lowered, client_id))
+        return [(client_id, self.names[client_id][0]) for *_key, client_id in heapq.nsmallest(limit, matches)]
+
+
+def _current_version(scope):
+    version = cache.get(version_key(scope))
+    if version is None:
+        cache.add(version_key(scope), time.time_ns(), timeout=None)
+        version = cache.get(version_key(scope))
+    return version
+
+
+def _index(scope):
+    version = _current_version(scope)
+    with _lock:
+        index = _indexes.get(scope)
+        if index is not None and index.version == version and time.monotonic() - index.built < settings.CLIENT_SUGGEST_MAX_AGE:
+            _indexes.move_to_end(scope)
+            return index
+
+    clients = Client.objects.all() if scope == ALL_CLIENTS else Client.objects.filter(invoice_owner_id=scope)
+    index = ClientNameIndex(version, clients.values_list('id', 'name'))
+    with _lock:
+        _indexes[scope] = index
+        _indexes.move_to_end(scope)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def suggest_clients(user, text, limit=10):
+    """The user's best ``limit`` client matches for ``text`` as ``(id, name)`` pairs; staff see every client."""
+    index = _index(ALL_CLIENTS if user.is_staff else user.pk)
+    # Saves in other threads change indexes in place
+    with _lock:
+        return index.suggest(text, limit)
+
+
+def _apply(owner_id, change):
+    """
+    Move the owner's and the staff version on, and apply ``change`` to this
+    process's indexes that were up to date. Other processes see the new
+    version and rebuild theirs on their next lookup.
+
+    The version is a counter moved on with ``cache.incr``, so concurrent
+    changes in other processes each take their own number. An index is only
+    patched when this change is the one right after its version; otherwise a
+    change it has not seen came in between, and it is dropped.
+    """
+    for scope in (owner_id, ALL_CLIENTS):
+        key = version_key(scope)
+        cache.add(key, time.time_ns(), timeout=None)
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            # Evicted since the add; the next lookup starts a new version
+            version = None
+        with _lock:
+            index = _indexes.get(scope)
+            if index is None:
+                continue
+            if change is not None and None not in (version, index.version) and version == index.version + 1:
+                change(index)
+                index.version = version
+            else:
+                del _indexes[scope]
+
+
+def update_client_name(client):
+    """Update the suggestions once the transaction saving ``client`` commits."""
+    client_id, name, owner_id = client.pk, client.name, client.invoice_owner_id
+    transaction.on_commit(lambda: _apply(owner_id, lambda index: index.add(client_id, name)))
+
+
+def remove_client_name(client):
+    client_id, owner_id = client.pk, client.invoice_owner_id
+    transaction.on_commit(lambda: _apply(owner_id, lambda index: index.remove(client_id)))
+
+
+def invalidate_client_names(owner_id):
+    """Rebuild the owner's suggestions on next use, e.g. after clients were bulk created."""
+    transaction.on_commit(lambda: _apply(owner_id, None))
@@ -0,0 +1,180 @@
+import base64
+import datetime
+import json
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from ninja.errors import HttpError
+from .fieldsets import client_fieldset, invoice_fieldset, invoice_item_fieldset
+from .models import Client, Invoice, InvoiceItem, Tombstone
+
+# Rows written in a transaction are stamped again once it commits (see
+# stamp_on_commit), so a row becomes visible at most moments before its
+# updated_at. Cursors start this far back to cover that gap; clients just apply
+# the few rows they already have again. A process that dies between the commit
+# and the second stamp leaves its rows with their earlier stamp, and a sync
+# that already passed it misses them until they change again.
+SYNC_OVERLAP = datetime.timedelta(seconds=10)
+SYNC_PAGE_SIZE = 500
+MAX_SYNC_PAGE_SIZE = 2000
+
+# key -> fieldset, model, owner lookup; pages walk them in this order
+SYNC_KINDS = {
+    'clients': (client_fieldset, Client, 'invoice_owner'),
+    'invoices': (invoice_fieldset, Invoice, 'client__invoice_owner'),
+    'items': (invoice_item_fieldset, InvoiceItem, 'invoice__client__invoice_owner'),
+}
+
+DELETED_KEYS = {
+    Tombstone.CLIENT: 'clients',
+    Tombstone.INVOICE: 'invoices',
+    Tombstone.INVOICE_ITEM: 'items',
+}
+
+_unstamped = threading.local()
+
+
+def stamp_on_commit(model, *ids, field='pk'):
+    """
+    Set ``updated_at``, or a tombstone's ``deleted_at``, of the given rows again
+    once the current transaction commits. A row is stamped when it is saved but
+    only seen once committed, so without this a long transaction could commit
+    rows behind a sync cursor that had already moved past their stamp. Outside
+    a transaction the save commits at once and nothing is needed.
+    """
+    if not ids or not connection.in_atomic_block:
+        return
+    if not hasattr(_unstamped, 'rows'):
+        _unstamped.rows = {}
+    _unstamped.rows.setdefault((model, field), set()).update(ids)
+    transaction.on_commit(_stamp)
+
+
+def _stamp():
+    # As search._flush: the first callback stamps everything pending, the rest find nothing to do.
+    # Ids left over from a rolled back transaction are stamped too, which only resends those rows.
+    pending, _unstamped.rows = getattr(_unstamped, 'rows', {}), {}
+    now = timezone.now()
+    for (model, field), ids in pending.items():
+        column = 'deleted_at' if model is Tombstone else 'updated_at'
+        model.objects.filter(**{f'{field}__in': ids}).update(**{column: now})
+
+
+def _encode(value):
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def _decode(cursor):
+    return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+
+
+def encode_sync_cursor(moment):
+    return _encode(moment.isoformat())
+
+
+def decode_sync_cursor(cursor):
+    try:
+        moment = datetime.datetime.fromisoformat(_decode(cursor))
+    except (ValueError, UnicodeDecodeError):
+        raise HttpError(400, "Invalid sync cursor.")
+    if timezone.is_naive(moment):
+        raise HttpError(400, "Invalid sync cursor.")
+    return moment
+
+
+def parse_sync_kinds(value):
+    kinds = tuple(dict.fromkeys(part.strip() for part in value.split(',') if part.strip()))
+    if not kinds or any(kind not in SYNC_KINDS for kind in kinds):
+        raise HttpError(400, f"kinds must be a comma-separated subset of {', '.join(SYNC_KINDS)}.")
+    return kinds
+
+
+class SyncPage:
+    """Where a sync left off: the rows past ``after`` of ``kinds[position]`` are next."""
+
+    def __init__(self, since, started, kinds, position=0, after=0):
+        self.since = since
+        self.started = started
+        self.kinds = kinds
+        self.position = position
+        self.after = after
+
+    def encode(self):
+        since = self.since and self.since.isoformat()
+        return _encode(json.dumps([since, self.started.isoformat(), self.kinds, self.position, self.after]))
+
+    @classmethod
+    def decode(cls, token):
+        try:
+            since, started, kinds, position, after = json.loads(_decode(token))
+            since = since and datetime.datetime.fromisoformat(since)
+            started = datetime.datetime.fromisoformat(started)
+            if not all(kind in SYNC_KINDS for kind in kinds) or not 0 <= int(position) < len(kinds):
+                raise ValueError
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise HttpError(400, "Invalid sync page.")
+        return cls(since, started, tuple(kinds), int(position), int(after))
+
+
+def changes_since(user, since=None, kinds=tuple(SYNC_KINDS), limit=SYNC_PAGE_SIZE, page=None):
+    """
+    One page of the clients, invoices and items the user can see that changed
+    since ``since``, the ids deleted since then and the cursor for the next
+    sync. Without ``since`` everything is returned, page by page.
+
+    Pages hold up to ``limit`` rows in id order, one kind after another. While
+    ``next`` is set, ask again with ``page=next``; store ``cursor`` once the
+    last page is in. Deletions come with the first page and are applied after
+    the changed rows of every page.
+
+    Deleting a client or invoice records one tombstone for it, not for the
+    invoices and items that went with it, so clients drop those along with
+    their parent.
+    """
+    if page is None:
+        page = SyncPage(since, timezone.now(), tuple(kinds))
+        if since is not None and since < page.started - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+            raise HttpError(410, "The sync cursor is too old; reload everything without `since`.")
+        first = True
+    else:
+        first = False
+
+    deleted = {key: [] for key in DELETED_KEYS.values()}
+    if first and page.since is not None:
+        tombstones = Tombstone.objects.filter(deleted_at__gte=page.since)
+        if not user.is_staff:
+            tombstones = tombstones.filter(invoice_owner=user)
+        for kind, object_id in tombstones.values_list('kind', 'object_id'):
+            if DELETED_KEYS[kind] in page.kinds:
+                deleted[DELETED_KEYS[kind]].append(object_id)
+
+    changes = {key: [] for key in SYNC_KINDS}
+    remaining = limit
+    next_page = None
+    while page.position < len(page.kinds):
+        key = page.kinds[page.position]
+        fieldset, model, owner_lookup = SYNC_KINDS[key]
+        queryset = model.objects.filter(id__gt=page.after)
+        if not user.is_staff:
+            queryset = queryset.filter(**{owner_lookup: user})
+        if page.since is not None:
+            queryset = queryset.filter(updated_at__gte=page.since)
+
+        selection = fieldset.select()
+        rows = list(selection.values(queryset.order_by('id'))[:remaining + 1])
+        changes[key] = selection.serialize(rows[:remaining])
+        if len(rows) > remaining:
+            page.after = rows[remaining - 1]['id']
+            next_page = page.encode()
+            break
+        remaining -= len(rows)
+        page.position += 1
+        page.after = 0
+        if not remaining and page.position < len(page.kinds):
+            next_page = page.encode()
+            break
+
+    cursor = encode_sync_cursor(page.started - SYNC_OVERLAP)
+    return {**changes, 'deleted': deleted, 'cursor': cursor, 'next': next_page}
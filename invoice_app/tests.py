@@ -1,3 +1,796 @@
-from django.test import TestCase
+import datetime
+import inspect
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Executor, Future
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .api import read_view
+from .cache import FileCache
+from .exporter import iter_invoice_lines
+from .importer import import_records
+from .mail import send_user_email
+from .management.commands import benchmark_pdf
+from .pdf import PDF_BASE_URL, PDFCache, _init_render_worker, asset_url_fetcher, invoice_fingerprint, pdf_cache, pdf_resources
+from .renderers import JSON, MSGPACK, preferred_media_type
+from .models import InvoiceOwner, Client, Invoice, InvoiceItem, PDFJob, ReferenceSequence, Tombstone
+from .search_query import Term, client_query_parser, invoice_query_parser
+from .suggest import version_key
+from .sync import encode_sync_cursor
+
+
+class APITestCase(TestCase):
+    """An owner with one client, logged in; API responses are cached, so each test starts with an empty cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = self.create_owner('owner@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_record = Client.objects.create(name="Acme Traders", invoice_owner=self.owner)
+        self.client.force_login(self.owner)
+
+    def create_owner(self, email):
+        return InvoiceOwner.objects.create(email=email, name="Owner", phone="+923001234567")
+
+    def create_invoice(self, client=None, items=0, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice = Invoice(client=client or self.client_record, **kwargs)
+            invoice.save()
+            for i in range(items):
+                InvoiceItem(invoice=invoice, name=f"Item {i}", unit="pc", quantity=Decimal(1), unit_price=Decimal(10)).save()
+        return invoice
+
+
+class PDFCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        overrides = self.settings(PDF_CACHE_ROOT=root.name, PDF_CACHE_MAX_SIZE=100)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.pdf_cache = PDFCache()
+
+    def test_fingerprint_changes_with_the_items(self):
+        invoice = self.create_invoice(items=1)
+        fingerprint = invoice_fingerprint(Invoice.objects.get(pk=invoice.pk))
+        self.assertEqual(invoice_fingerprint(Invoice.objects.get(pk=invoice.pk)), fingerprint)
+
+        item = invoice.items.get()
+        item.quantity = Decimal(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertNotEqual(invoice_fingerprint(Invoice.objects.get(pk=invoice.pk)), fingerprint)
+
+    def test_new_rendering_replaces_the_old_one(self):
+        self.pdf_cache.put(1, 'old', b'first')
+        self.pdf_cache.put(1, 'new', b'second')
+        self.assertIsNone(self.pdf_cache.open(1, 'old'))
+        with self.pdf_cache.open(1, 'new') as pdf_file:
+            self.assertEqual(pdf_file.read(), b'second')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for invoice_id in (1, 2):
+            path = self.pdf_cache.put(invoice_id, 'pdf', b'x' * 40)
+            os.utime(path, (invoice_id, invoice_id))
+        # Reading the older entry makes the other one least recently used
+        self.pdf_cache.open(1, 'pdf').close()
+        self.pdf_cache.put(3, 'pdf', b'x' * 40)
+
+        self.assertIsNone(self.pdf_cache.open(2, 'pdf'))
+        for invoice_id in (1, 3):
+            self.pdf_cache.open(invoice_id, 'pdf').close()
+
+
+class InlineExecutor(Executor):
+    """Runs each call as it is submitted, in place of the render pool, whose processes cannot see the test database."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class PDFExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        overrides = self.settings(PDF_CACHE_ROOT=root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        pool = mock.patch('invoice_app.pdf.shared_render_pool', return_value=InlineExecutor())
+        pool.start()
+        self.addCleanup(pool.stop)
+
+    def cache_pdf(self, invoice):
+        invoice = Invoice.objects.select_related('client__invoice_owner').get(pk=invoice.pk)
+        pdf_cache.put(invoice.pk, invoice_fingerprint(invoice), f'PDF {invoice.reference_number}'.encode())
+
+    def test_archive_holds_the_filtered_invoices(self):
+        paid = self.create_invoice(is_paid=True)
+        self.create_invoice(is_paid=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            other_client = Client.objects.create(name="Acme Rival", invoice_owner=self.create_owner('other@example.com'))
+        other = self.create_invoice(client=other_client, is_paid=True)
+        for invoice in (paid, other):
+            self.cache_pdf(invoice)
+
+        response = self.client.get('/api/v1/invoices/export.zip', {'is_paid': True})
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [f'{paid.reference_number}.pdf'])
+        self.assertEqual(archive.read(f'{paid.reference_number}.pdf'), f'PDF {paid.reference_number}'.encode())
+
+
+class AssetFetcherTests(TestCase):
+    def test_media_and_static_files_are_read_from_disk(self):
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root, STATIC_ROOT=None):
+            with open(os.path.join(media_root, 'logo.png'), 'wb') as logo:
+                logo.write(b'PNG')
+            asset = asset_url_fetcher(PDF_BASE_URL + 'media/logo.png')
+            self.assertEqual((asset['string'], asset['mime_type']), (b'PNG', 'image/png'))
+
+            stylesheet = asset_url_fetcher(PDF_BASE_URL + 'static/invoice_app/css/invoice_pdf.css')
+            self.assertEqual(stylesheet['mime_type'], 'text/css')
+            self.assertTrue(stylesheet['string'])
+
+    def test_anything_else_is_refused(self):
+        for url in ('https://example.com/logo.png', PDF_BASE_URL + 'media/../manage.py', PDF_BASE_URL + 'admin/'):
+            with self.subTest(url=url), self.assertRaises(ValueError):
+                asset_url_fetcher(url)
+
+
+class NDJSONExportTests(APITestCase):
+    def test_one_line_per_invoice_with_its_items(self):
+        first = self.create_invoice(items=2)
+        second = self.create_invoice(is_paid=True)
+        response = self.client.get('/api/v1/invoices/export.ndjson')
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([line['id'] for line in lines], [first.pk, second.pk])
+        self.assertEqual([item['name'] for item in lines[0]['items']], ["Item 0", "Item 1"])
+        self.assertEqual(lines[1]['items'], [])
+
+        response = self.client.get('/api/v1/invoices/export.ndjson', {'is_paid': True})
+        self.assertEqual([json.loads(line)['id'] for line in b''.join(response.streaming_content).splitlines()], [second.pk])
+
+    def test_items_are_read_once_per_chunk(self):
+        for _ in range(4):
+            self.create_invoice(items=2)
+        with CaptureQueriesContext(connection) as queries:
+            lines = list(iter_invoice_lines(Invoice.objects.all(), chunk_size=2))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(len([query for query in queries if 'FROM "invoice_app_invoiceitem"' in query['sql']]), 2)
+
+
+class PDFJobTests(APITestCase):
+    def test_job_is_queued_for_its_owner_only(self):
+        invoice = self.create_invoice(items=1)
+        response = self.client.post(f'/api/v1/invoices/{invoice.pk}/pdf/')
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], PDFJob.QUEUED)
+
+        self.assertEqual(self.client.get(f"/api/v1/pdf-jobs/{job['id']}/").json()['status'], PDFJob.QUEUED)
+        self.assertEqual(self.client.get(f"/api/v1/pdf-jobs/{job['id']}/download/").status_code, 409)
+
+        self.client.force_login(self.create_owner('other@example.com'))
+        self.assertEqual(self.client.get(f"/api/v1/pdf-jobs/{job['id']}/").status_code, 404)
+        self.assertEqual(self.client.post(f'/api/v1/invoices/{invoice.pk}/pdf/').status_code, 404)
+
+    def test_each_job_is_claimed_once(self):
+        invoice = self.create_invoice()
+        jobs = [PDFJob.objects.create(invoice=invoice, requested_by=self.owner) for _ in range(3)]
+        self.assertEqual(PDFJob.objects.claim(2), jobs[:2])
+        self.assertEqual(PDFJob.objects.claim(2), jobs[2:])
+        self.assertEqual(PDFJob.objects.claim(2), [])
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = PDFJob.objects.create(invoice=self.create_invoice(), requested_by=self.owner)
+        PDFJob.objects.claim(1)
+        self.assertEqual(PDFJob.objects.requeue_stale(datetime.timedelta(minutes=10)), 0)
+        PDFJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(PDFJob.objects.requeue_stale(datetime.timedelta(minutes=10)), 1)
+        self.assertEqual(PDFJob.objects.claim(1), [job])
+
+
+class BenchmarkPDFTests(TestCase):
+    def test_timings_past_the_allowed_regression_fail(self):
+        row = {'items': 10, 'template_seconds': 1.0, 'write_pdf_seconds': 1.0, 'view_cold_seconds': 1.0, 'view_cached_seconds': 1.0}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as baseline:
+            json.dump({'results': [row]}, baseline)
+            baseline.flush()
+            command = benchmark_pdf.Command()
+            command.check_regressions([{**row, 'write_pdf_seconds': 1.2}, {**row, 'items': 100, 'write_pdf_seconds': 9.0}], baseline.name, 0.25)
+            with self.assertRaisesRegex(CommandError, "10 items: write_pdf_seconds"):
+                command.check_regressions([{**row, 'write_pdf_seconds': 1.3}], baseline.name, 0.25)
+
+
+class PDFWarmUpTests(TestCase):
+    def test_resources_are_built_once_per_process(self):
+        with mock.patch('invoice_app.pdf._pdf_resources', None):
+            self.assertIs(pdf_resources(), pdf_resources())
+
+    def test_only_rendering_processes_warm_up(self):
+        with self.settings(PDF_WARM_UP=True), mock.patch('invoice_app.pdf.warm_up') as warm_up:
+            apps.get_app_config('invoice_app').ready()
+            warm_up.assert_not_called()
+            with mock.patch('django.setup'):
+                _init_render_worker()
+            warm_up.assert_called_once_with()
+
+    def test_warm_up_can_be_turned_off(self):
+        with self.settings(PDF_WARM_UP=False), mock.patch('invoice_app.pdf.warm_up') as warm_up, mock.patch('django.setup'):
+            _init_render_worker()
+        warm_up.assert_not_called()
+
+
+class TotalsTests(APITestCase):
+    def test_python_and_sql_totals_agree(self):
+        invoice = self.create_invoice(tax_percentage=Decimal(10), transit_charges=Decimal('0.001'))
+        with self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem(invoice=invoice, name="Washer", unit="pc", quantity=Decimal(1), unit_price=Decimal('0.004')).save()
+            invoice.update_totals()
+        invoice.refresh_from_db()
+        # 10% of 0.005 is exactly half way between 0.000 and 0.001
+        self.assertEqual((invoice.total_price, invoice.tax, invoice.grand_total), (Decimal('0.005'), Decimal('0.001'), Decimal('0.006')))
+
+        call_command('recalculate_totals', stdout=io.StringIO())
+        recalculated = Invoice.objects.get(pk=invoice.pk)
+        self.assertEqual((recalculated.tax, recalculated.grand_total), (invoice.tax, invoice.grand_total))
+        self.assertEqual(recalculated.updated_at, invoice.updated_at)
+
+
+class ReferenceSequenceTests(APITestCase):
+    def test_allocate_hands_out_consecutive_numbers(self):
+        first = ReferenceSequence.objects.allocate(self.owner.pk, False)
+        self.assertEqual(ReferenceSequence.objects.allocate(self.owner.pk, False, count=3), first + 1)
+        self.assertEqual(ReferenceSequence.objects.allocate(self.owner.pk, False), first + 4)
+
+    def test_invoices_and_quotations_are_numbered_separately(self):
+        self.assertEqual(ReferenceSequence.objects.allocate(self.owner.pk, False), 1)
+        self.assertEqual(ReferenceSequence.objects.allocate(self.owner.pk, True), 1)
+
+    def test_owners_are_numbered_separately(self):
+        other = self.create_owner('other@example.com')
+        ReferenceSequence.objects.allocate(self.owner.pk, False, count=5)
+        self.assertEqual(ReferenceSequence.objects.allocate(other.pk, False), 1)
+
+    def test_sequence_continues_after_existing_references(self):
+        Invoice.objects.bulk_create([Invoice(client=self.client_record, reference_number="I_SAE-0041")])
+        self.assertEqual(ReferenceSequence.objects.allocate(self.owner.pk, False), 42)
+
+    def test_saving_invoices_assigns_references(self):
+        self.assertEqual(self.create_invoice().reference_number, "I_SAE-0001")
+        self.assertEqual(self.create_invoice().reference_number, "I_SAE-0002")
+        self.assertEqual(self.create_invoice(is_quotation=True).reference_number, "Q_SAE-0001")
+
+
+class InvoiceItemBatchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.invoice = self.create_invoice(tax_percentage=Decimal(10))
+        self.url = f'/api/v1/invoices/{self.invoice.pk}/items/batch/'
+
+    def send(self, method, payload, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(self.url, payload, content_type='application/json', QUERY_STRING=params.get('query', ''))
+
+    def test_items_are_created_with_one_totals_update(self):
+        payload = [{'name': f"Item {i}", 'unit': "pc", 'quantity': 2, 'unit_price': 5} for i in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send('post', payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['total_price'] for row in response.json()], [10, 10, 10])
+        totals_updates = [query for query in queries if query['sql'].startswith('UPDATE "invoice_app_invoice" SET "total_price"')]
+        self.assertEqual(len(totals_updates), 1)
+
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total_price, self.invoice.grand_total), (Decimal(30), Decimal(33)))
+
+    def test_invalid_items_save_nothing(self):
+        payload = [{'name': "Fine", 'unit': "pc", 'quantity': 1, 'unit_price': 5}, {'name': "Bad", 'unit': "pc", 'quantity': -1, 'unit_price': 5}]
+        response = self.send('post', payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['detail'][0].startswith("Item 2:"))
+        self.assertFalse(self.invoice.items.exists())
+
+    def test_items_are_updated_and_deleted_together(self):
+        items = self.send('post', [{'name': f"Item {i}", 'unit': "pc", 'quantity': 1, 'unit_price': 5} for i in range(3)]).json()
+
+        response = self.send('patch', [{'id': items[0]['id'], 'quantity': 4}, {'id': items[1]['id'], 'unit_price': 1}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['total_price'] for row in response.json()], [20, 1])
+        self.assertEqual(self.send('patch', [{'id': 999999, 'quantity': 1}]).status_code, 404)
+
+        response = self.send('delete', None, query=f"ids={items[0]['id']}&ids={items[2]['id']}")
+        self.assertEqual(response.status_code, 204)
+        self.invoice.refresh_from_db()
+        self.assertEqual(list(self.invoice.items.values_list('id', flat=True)), [items[1]['id']])
+        self.assertEqual(self.invoice.total_price, Decimal(1))
+
+
+class ImportTests(APITestCase):
+    def upload(self, kind, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/v1/import/{kind}/', {'file': SimpleUploadedFile(name, content.encode())})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_csv_clients_are_created_and_bad_rows_reported(self):
+        report = self.upload('clients', 'clients.csv', "name,address\nBeta Mills,Lahore\n,Karachi\nGamma Steel,\n")
+        self.assertEqual((report['created'], report['failed']), (2, 1))
+        self.assertEqual(report['errors'][0]['row'], 3)
+        self.assertEqual(
+            list(Client.objects.filter(invoice_owner=self.owner).order_by('id').values_list('name', 'address')),
+            [("Acme Traders", None), ("Beta Mills", "Lahore"), ("Gamma Steel", None)],
+        )
+
+    def test_csv_rows_with_one_invoice_key_form_one_invoice(self):
+        content = (
+            "invoice_key,client_name,tax_percentage,item_name,item_unit,item_quantity,item_unit_price\n"
+            "a,Acme Traders,10,Bolt,pc,2,5\n"
+            "a,,,Nut,pc,4,1\n"
+            "b,Acme Traders,,Washer,pc,1,3\n"
+        )
+        self.assertEqual(self.upload('invoices', 'invoices.csv', content), {'created': 2, 'failed': 0, 'errors': []})
+
+        first, second = Invoice.objects.order_by('id')
+        self.assertEqual((first.reference_number, second.reference_number), ("I_SAE-0001", "I_SAE-0002"))
+        self.assertEqual(list(first.items.order_by('id').values_list('name', flat=True)), ["Bolt", "Nut"])
+        self.assertEqual((first.total_price, first.grand_total), (Decimal(14), Decimal('15.4')))
+
+    def test_ndjson_invoices_are_imported_in_batches(self):
+        lines = [
+            {'client_id': self.client_record.pk, 'items': [{'name': "Bolt", 'unit': "pc", 'quantity': 1, 'unit_price': 5}]},
+            "not json",
+            {'client_name': "Nobody"},
+            {'client_name': "Acme Traders", 'is_quotation': True},
+        ]
+        content = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_records('invoices', self.owner, io.BytesIO(content.encode()), 'ndjson', batch_size=1)
+
+        self.assertEqual((report['created'], report['failed']), (2, 2))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3])
+        self.assertEqual(
+            sorted(Invoice.objects.values_list('reference_number', flat=True)), ["I_SAE-0001", "Q_SAE-0001"],
+        )
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.invoices = [self.create_invoice() for _ in range(5)]
+        # Newest first
+        self.expected = [invoice.pk for invoice in reversed(self.invoices)]
+
+    def get_page(self, cursor=None):
+        params = {'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get('/api/v1/invoices/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_forward_and_back(self):
+        first = self.get_page()
+        self.assertEqual([row['id'] for row in first['items']], self.expected[:2])
+        self.assertIsNone(first['previous'])
+
+        second = self.get_page(first['next'])
+        self.assertEqual([row['id'] for row in second['items']], self.expected[2:4])
+
+        last = self.get_page(second['next'])
+        self.assertEqual([row['id'] for row in last['items']], self.expected[4:])
+        self.assertIsNone(last['next'])
+
+        back = self.get_page(second['previous'])
+        self.assertEqual([row['id'] for row in back['items']], self.expected[:2])
+        self.assertIsNone(back['previous'])
+
+    def test_rows_are_not_repeated_or_skipped_when_one_changes(self):
+        first = self.get_page()
+        # Moves the newest-but-one invoice to the front; the next page still starts after the first page
+        Invoice.objects.filter(pk=self.expected[1]).update(updated_at=timezone.now())
+        second = self.get_page(first['next'])
+        self.assertEqual([row['id'] for row in second['items']], self.expected[2:4])
+
+    def test_bad_cursor_is_rejected(self):
+        for cursor in ('not-a-cursor', 'W1tdLCBmYWxzZV0'):
+            response = self.client.get('/api/v1/invoices/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'detail': "Invalid cursor."})
+
+
+class ResponseCacheTests(APITestCase):
+    def invoice_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query for query in queries if 'FROM "invoice_app_invoice"' in query['sql']]
+
+    def test_reads_are_cached_until_the_owner_writes(self):
+        invoice = self.create_invoice()
+        url = '/api/v1/invoices/'
+        self.assertTrue(self.invoice_queries(url))
+        self.assertFalse(self.invoice_queries(url))
+
+        # Another owner's writes leave this owner's responses cached
+        other = self.create_owner('other@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(name="Acme Rival", invoice_owner=other)
+        self.assertFalse(self.invoice_queries(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/v1/invoices/{invoice.pk}/', {'notes': "Updated"}, content_type='application/json')
+        self.assertTrue(self.invoice_queries(url))
+        self.assertEqual(self.client.get(url).json()['items'][0]['notes'], "Updated")
+
+    def test_responses_are_cached_per_user(self):
+        url = '/api/v1/clients/'
+        self.client.get(url)
+        self.client.force_login(self.create_owner('other@example.com'))
+        self.assertEqual(self.client.get(url).json()['items'], [])
+
+
+class ETagTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.invoice = self.create_invoice()
+        self.url = f'/api/v1/invoices/{self.invoice.pk}/'
+
+    def test_unchanged_invoice_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_patch_with_current_etag_succeeds(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'notes': "Updated"}, content_type='application/json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_patch_with_stale_etag_fails(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(self.url, {'notes': "First"}, content_type='application/json')
+        response = self.client.patch(self.url, {'notes': "Second"}, content_type='application/json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.notes, "First")
+
+    def test_list_is_not_modified_until_a_write(self):
+        etag = self.client.get('/api/v1/invoices/')['ETag']
+        # Answered from the cached generations, without reading or counting invoices
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/invoices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries if '"invoice_app_invoice"' in query['sql']])
+
+        self.create_invoice()
+        self.assertEqual(self.client.get('/api/v1/invoices/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertNotEqual(self.client.get('/api/v1/invoices/?limit=1')['ETag'], etag)
+
+
+class FileCacheTests(TestCase):
+    def test_culls_every_few_sets(self):
+        with tempfile.TemporaryDirectory() as location:
+            file_cache = FileCache(location, {'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2, 'CULL_EVERY': 5}})
+            for i in range(5):
+                file_cache.set(f'key{i}', i)
+            # Checked on the first set only, when the cache was empty
+            self.assertEqual(len(file_cache._list_cache_files()), 5)
+            # The sixth set culls half of the five entries before writing its own
+            file_cache.set('key5', 5)
+            self.assertEqual(len(file_cache._list_cache_files()), 4)
+
+    def test_incr_is_atomic(self):
+        with tempfile.TemporaryDirectory() as location:
+            FileCache(location, {}).set('counter', 0)
+
+            def increment():
+                # A cache instance of its own, as in another process
+                file_cache = FileCache(location, {})
+                for _ in range(25):
+                    file_cache.incr('counter')
+
+            threads = [threading.Thread(target=increment) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(FileCache(location, {}).get('counter'), 200)
+
+
+class NegotiationTests(APITestCase):
+    def test_accept_ranges_are_ranked_by_q(self):
+        cases = {
+            '': JSON,
+            '*/*': JSON,
+            'application/*': JSON,
+            'application/msgpack': MSGPACK,
+            'application/x-msgpack, application/json': MSGPACK,
+            'application/json, application/msgpack;q=0.5': JSON,
+            'application/msgpack;q=0, */*': JSON,
+            'application/json;q=0, */*': MSGPACK,
+            'application/msgpack;q=0.8, application/json;q=0.9': JSON,
+            'application/msgpack;q=bad': JSON,
+            'text/html, application/xhtml+xml': JSON,
+        }
+        for accept, media_type in cases.items():
+            with self.subTest(accept=accept):
+                self.assertEqual(preferred_media_type(RequestFactory().get('/', HTTP_ACCEPT=accept)), media_type)
+
+    def test_msgpack_body_matches_the_json_one(self):
+        invoice = self.create_invoice(items=1)
+        as_json = self.client.get(f'/api/v1/invoices/{invoice.pk}/')
+        as_msgpack = self.client.get(f'/api/v1/invoices/{invoice.pk}/', HTTP_ACCEPT=MSGPACK)
+        self.assertEqual(as_msgpack['Content-Type'], MSGPACK)
+        self.assertIn('Accept', as_msgpack['Vary'])
+        self.assertEqual(msgpack.unpackb(as_msgpack.content), as_json.json())
+
+
+class TrustedResponseTests(APITestCase):
+    def test_trusted_responses_match_validated_ones(self):
+        invoice = self.create_invoice(items=2, notes="Net 30")
+        urls = [
+            '/api/v1/invoices/?expand=client',
+            f'/api/v1/invoices/{invoice.pk}/?fields=id,notes,grand_total',
+            f'/api/v1/invoices/{invoice.pk}/items/?expand=invoice',
+            '/api/v1/invoices/999999/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                bodies = []
+                for trusted in (True, False):
+                    cache.clear()
+                    with self.settings(API_TRUSTED_RESPONSES=trusted):
+                        response = self.client.get(url)
+                    bodies.append((response.status_code, response.json()))
+                self.assertEqual(bodies[0], bodies[1])
+
+
+class SyncTests(APITestCase):
+    def test_deleting_an_invoice_leaves_one_tombstone(self):
+        invoice_id = self.create_invoice(items=3).pk
+        cursor = self.client.get('/api/v1/sync/').json()['cursor']
+        Invoice.objects.get(pk=invoice_id).delete()
+
+        response = self.client.get('/api/v1/sync/', {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['deleted'], {'clients': [], 'invoices': [invoice_id], 'items': []})
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+    def test_full_load_is_paged(self):
+        invoice_ids = {self.create_invoice(items=2).pk for _ in range(3)}
+        seen, page = [], None
+        while True:
+            params = {'kinds': 'clients,invoices', 'limit': 2}
+            if page:
+                params['page'] = page
+            body = self.client.get('/api/v1/sync/', params).json()
+            self.assertLessEqual(len(body['clients']) + len(body['invoices']), 2)
+            self.assertEqual(body['items'], [])
+            seen += [('invoice', row['id']) for row in body['invoices']]
+            seen += [('client', row['id']) for row in body['clients']]
+            page = body['next']
+            if not page:
+                break
+        self.assertEqual(sorted(seen), sorted([('client', self.client_record.pk)] + [('invoice', pk) for pk in invoice_ids]))
+
+        # The cursor from the last page picks up later writes
+        new = self.create_invoice()
+        later = self.client.get('/api/v1/sync/', {'since': body['cursor']}).json()
+        self.assertIn(new.pk, [row['id'] for row in later['invoices']])
+
+    def test_old_cursor_is_gone(self):
+        cursor = encode_sync_cursor(timezone.now() - datetime.timedelta(days=365))
+        self.assertEqual(self.client.get('/api/v1/sync/', {'since': cursor}).status_code, 410)
+
+
+class BatchTests(APITestCase):
+    def test_sub_requests_are_combined(self):
+        invoice = self.create_invoice(items=2)
+        paths = [f'/api/v1/invoices/{invoice.pk}/', f'/api/v1/invoices/{invoice.pk}/items/', '/elsewhere/']
+        response = self.client.post('/api/v1/batch/', {'requests': [{'path': path} for path in paths]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        responses = response.json()['responses']
+        self.assertEqual([(row['path'], row['status']) for row in responses], list(zip(paths, [200, 200, 404])))
+        self.assertEqual(responses[0]['body']['id'], invoice.pk)
+        self.assertEqual(len(responses[1]['body']['items']), 2)
+
+    def test_ids_fetch_those_rows(self):
+        invoices = [self.create_invoice() for _ in range(3)]
+        ids = f'{invoices[0].pk},{invoices[2].pk}'
+        rows = self.client.get('/api/v1/invoices/', {'ids': ids}).json()['items']
+        self.assertEqual({row['id'] for row in rows}, {invoices[0].pk, invoices[2].pk})
+
+
+class AsyncViewTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.invoice = self.create_invoice(items=2)
+        self.async_client.force_login(self.owner)
+
+    async def test_asgi_requests_read_the_same_data(self):
+        for url in ('/api/v1/auth/current-user/', '/api/v1/invoices/', f'/api/v1/invoices/{self.invoice.pk}/items/'):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                expected = await sync_to_async(self.client.get)(url)
+                self.assertEqual(response.json(), expected.json())
+
+    def test_read_views_are_async_only_when_enabled(self):
+        def view(request, id):
+            return {'id': id}
+
+        with self.settings(API_ASYNC_VIEWS=False):
+            self.assertIs(read_view(view), view)
+        with self.settings(API_ASYNC_VIEWS=True):
+            async_view = read_view(view)
+        self.assertTrue(inspect.iscoroutinefunction(async_view))
+        self.assertEqual(async_to_sync(async_view)(None, id=7), {'id': 7})
+
+    def test_email_is_sent_from_a_background_thread(self):
+        send_user_email(self.owner, "Password Reset Request", "emails/password_reset_email.html", {'reset_link': "https://example.com/reset/", 'user': self.owner}).result()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.owner.email])
+        self.assertIn("https://example.com/reset/", mail.outbox[0].body)
+
+
+class SearchTests(APITestCase):
+    def search(self, text):
+        response = self.client.get('/api/v1/search/', {'q': text})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_invoice_is_found_by_its_items_and_client(self):
+        invoice = self.create_invoice(items=1)
+        self.assertEqual([row['id'] for row in self.search("item")['invoices']], [invoice.pk])
+        results = self.search("acme")
+        self.assertEqual([row['id'] for row in results['clients']], [self.client_record.pk])
+        self.assertEqual([row['id'] for row in results['invoices']], [invoice.pk])
+
+    def test_renamed_client_is_reindexed_with_its_invoices(self):
+        invoice = self.create_invoice()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_record.name = "Zenith Supplies"
+            self.client_record.save()
+
+        self.assertEqual(self.search("acme"), {'clients': [], 'invoices': []})
+        self.assertEqual([row['id'] for row in self.search("zenith")['invoices']], [invoice.pk])
+
+    def test_results_are_scoped_to_the_owner(self):
+        other = self.create_owner('other@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(name="Acme Rival", invoice_owner=other)
+        self.assertEqual([row['name'] for row in self.search("acme")['clients']], ["Acme Traders"])
+
+
+class QueryParserTests(APITestCase):
+    def test_terms(self):
+        today = datetime.date.today()
+        cases = {
+            "15": [Term('day', 15)],
+            "2024-03-15": [Term('date', datetime.date(2024, 3, 15))],
+            "15 march 2024": [Term('date', datetime.date(2024, 3, 15))],
+            "15-03-24": [Term('date', datetime.date(2024, 3, 15))],
+            "15/3": [Term('date', datetime.date(today.year, 3, 15))],
+            "I_SAE-42": [Term('reference', "I_SAE-0042")],
+            "1,250.50": [Term('amount', Decimal('1250.50'))],
+            "client:acme paid:no": [Term('client', "acme"), Term('paid', False)],
+            'client:"acme traders"': [Term('client', "acme traders")],
+            '"copper wire" cable': [Term('text', "copper wire"), Term('text', "cable")],
+        }
+        for text, terms in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(invoice_query_parser.parse(text), terms)
+
+    def test_terms_that_do_not_parse_are_text(self):
+        self.assertEqual(invoice_query_parser.parse("31-02-2024"), [Term('text', "31-02-2024")])
+        self.assertEqual(invoice_query_parser.parse("paid:maybe"), [Term('text', "paid:maybe")])
+        self.assertEqual(invoice_query_parser.parse("colour:red"), [Term('text', "colour:red")])
+        # Clients have no amounts or references
+        self.assertEqual(client_query_parser.parse("1,250.50"), [Term('text', "1,250.50")])
+
+    def test_build_filters_invoices(self):
+        paid = self.create_invoice(is_paid=True)
+        other = self.create_owner('other@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            other_client = Client.objects.create(name="Acme Rival", invoice_owner=other)
+        self.create_invoice(client=other_client)
+        unpaid = self.create_invoice()
+
+        def matches(text):
+            return set(Invoice.objects.filter(invoice_query_parser.build(self.owner, text)).values_list('pk', flat=True))
+
+        self.assertEqual(matches("client:acme"), {paid.pk, unpaid.pk})
+        self.assertEqual(matches("acme paid:yes"), {paid.pk})
+        self.assertEqual(matches(unpaid.reference_number), {unpaid.pk})
+        self.assertEqual(matches("nothing"), set())
+
+
+class SuggestTests(APITestCase):
+    def test_suggestions_are_scoped_to_the_owner(self):
+        other = self.create_owner('other@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(name="Acme Rival", invoice_owner=other)
+
+        response = self.client.get('/api/v1/clients/suggest/', {'q': "acm"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.json()], ["Acme Traders"])
+
+    def test_renamed_client_is_suggested_by_its_new_name(self):
+        self.client.get('/api/v1/clients/suggest/', {'q': "acme"})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_record.name = "Zenith Supplies"
+            self.client_record.save()
+
+        self.assertEqual(self.client.get('/api/v1/clients/suggest/', {'q': "acme"}).json(), [])
+        self.assertEqual(
+            [row['name'] for row in self.client.get('/api/v1/clients/suggest/', {'q': "zen"}).json()],
+            ["Zenith Supplies"],
+        )
+
+    def test_index_that_missed_a_change_is_rebuilt(self):
+        self.client.get('/api/v1/clients/suggest/', {'q': "acme"})
+        # Another process adds a client and moves the version on; this one never sees that change
+        Client.objects.bulk_create([Client(name="Acme Rival", invoice_owner=self.owner)])
+        cache.incr(version_key(self.owner.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_record.name = "Acme Holdings"
+            self.client_record.save()
+
+        self.assertEqual(
+            sorted(row['name'] for row in self.client.get('/api/v1/clients/suggest/', {'q': "acme"}).json()),
+            ["Acme Holdings", "Acme Rival"],
+        )
+
+
+class HTMLListTests(APITestCase):
+    def test_invoice_list_is_paged_newest_first(self):
+        invoices = [self.create_invoice() for _ in range(3)]
+        with mock.patch('invoice_app.views.InvoiceListView.page_size', 2):
+            first = self.client.get(reverse('invoice_app:invoice-list'))
+            self.assertEqual([invoice.pk for invoice in first.context['invoice_list']], [invoices[2].pk, invoices[1].pk])
+            second = self.client.get(reverse('invoice_app:invoice-list'), {'cursor': first.context['next_cursor']})
+        self.assertEqual([invoice.pk for invoice in second.context['invoice_list']], [invoices[0].pk])
+        self.assertIsNone(second.context['next_cursor'])
+
+    def test_lists_are_scoped_to_the_owner(self):
+        other = self.create_owner('other@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            rival = Client.objects.create(name="Acme Rival", invoice_owner=other)
+        self.create_invoice(client=rival)
+        own = self.create_invoice()
+
+        response = self.client.get(reverse('invoice_app:invoice-list'))
+        self.assertEqual([invoice.pk for invoice in response.context['invoice_list']], [own.pk])
+        response = self.client.get(reverse('invoice_app:client-list'))
+        self.assertEqual([client.pk for client in response.context['client_list']], [self.client_record.pk])
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        self.assertEqual(self.client.get(reverse('invoice_app:client-list'), {'cursor': "not-a-cursor"}).status_code, 400)
@@ -1,4 +1,5 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from decimal import Decimal
 
 class NoTrailingZeroNumberInput(forms.NumberInput):
@@ -10,4 +11,38 @@ class NoTrailingZeroNumberInput(forms.NumberInput):
             #Strip trailing 0s, leaving a minimum of 0 decimal places
             while (abs(value.as_tuple().exponent) > 0 and value.as_tuple().digits[-1] == 0):
                 value = Decimal(str(value)[:-1])
-            return value
\ No newline at end of file
+            return value
+
+class SuggestSelect(forms.Select):
+    """
+    A select that renders only the chosen option. A search box in front of it
+    fetches the other choices from ``url`` (a ``?q=`` endpoint returning
+    ``[{"id", "name"}]``) as the user types.
+    """
+
+    class Media:
+        js = ('invoice_app/js/suggest_select.js',)
+
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-suggest-url'] = str(self.url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        chosen = []
+        selected = [v for v in value if v]
+        if selected:
+            try:
+                chosen = [iterator.choice(obj) for obj in iterator.queryset.filter(pk__in=selected)]
+            except (ValueError, ValidationError):
+                pass
+        self.choices = [('', iterator.field.empty_label or '')] + chosen
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
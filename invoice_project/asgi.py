@@ -3,6 +3,25 @@ ASGI config for invoice_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Under ASGI the API read endpoints are served as async views (``API_ASYNC_VIEWS``,
+set here), so a worker keeps serving while they wait on the database or stream
+a PDF. To run it::
+
+    uvicorn invoice_project.asgi:application --workers 2
+
+or, with gunicorn managing the worker processes::
+
+    gunicorn invoice_project.asgi:application -k uvicorn.workers.UvicornWorker -w 2
+
+Django runs async ORM queries on one thread per request context, so database
+work is still one query at a time per request; what the event loop saves is the
+thread each slow client or idle request would otherwise hold. Keep
+``CONN_MAX_AGE`` at 0 under ASGI: persistent connections are per thread and
+are not closed between requests here. The WSGI entry point leaves
+``API_ASYNC_VIEWS`` off and serves plain sync views, which are faster there
+than async views run through ``async_to_sync``. ``manage.py loadtest_api``
+compares the two.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +31,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'invoice_project.settings')
+os.environ.setdefault('API_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
+
+from invoice_app.pdf import warm_up_if_enabled  # noqa: E402
+
+warm_up_if_enabled()
@@ -163,6 +163,12 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Rendered invoice PDFs, keyed on a fingerprint of everything the PDF shows
+PDF_CACHE_ROOT = MEDIA_ROOT / 'pdf_cache'
+PDF_CACHE_MAX_SIZE = 256 * 1024 * 1024  # 256 MB
+PDF_RENDER_PROCESSES = int(os.getenv('PDF_RENDER_PROCESSES', 2))  # Render processes per web worker process, for ZIP exports
+PDF_WARM_UP = not DEBUG  # Load PDF fonts and stylesheets when each web process and render worker starts
+
 # Django Ninja JWT
 NINJA_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -184,12 +190,25 @@ LOGIN_REDIRECT_URL = '/'
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 # Caching Configuration
+# Shared by every worker process so API cache invalidation reaches all of them
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
+        "BACKEND": "invoice_app.cache.FileCache",
+        "LOCATION": os.getenv('CACHE_DIR', BASE_DIR / 'cache'),  # Must be the same directory for every worker
+        "OPTIONS": {
+            # Cached responses live API_CACHE_TIMEOUT seconds, one per user, query string and
+            # generation; the default of 300 entries would cull on almost every request
+            "MAX_ENTRIES": 20000,
+            "CULL_FREQUENCY": 4,  # Remove a quarter of the entries when full
+            "CULL_EVERY": 100,  # Sets between directory scans, per worker thread
+        },
     }
 }
+API_ASYNC_VIEWS = os.getenv('API_ASYNC_VIEWS', 'False') == 'True'  # Serve API reads from async views; asgi.py turns this on
+API_CACHE_TIMEOUT = 60 * 5  # Seconds a cached API response is kept
+API_TRUSTED_RESPONSES = True  # Render fieldset output without re-validating it against the response schema
+SYNC_TOMBSTONE_DAYS = 30  # Days deletions are kept for /sync; older cursors must reload everything
+CLIENT_SUGGEST_MAX_AGE = 60 * 5  # Seconds a process keeps its client name index before reading it again
 
 # Email
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'invoice_project.settings')
 
 application = get_wsgi_application()
+
+from invoice_app.pdf import warm_up_if_enabled  # noqa: E402
+
+warm_up_if_enabled()